@@ -1,25 +1,30 @@
 import logging
-import re
-from lxml import html
-from urllib.parse import urlparse, urljoin, parse_qs
-from bs4 import BeautifulSoup
 from collections import defaultdict, Counter
-import requests
 from string import punctuation
 
+from counters import ExactCounter
+from parsers import PARSERS
+from url_cache import URLCache
+from url_filter import ALLOWED_SCHEMES, ExtensionRule
+from urlstore import URLStore
+
 logger = logging.getLogger(__name__)
 
+
 class Crawler:
     """
     This class is responsible for scraping urls from the next available link in frontier and adding the scraped links to
     the frontier
     """
 
-    def __init__(self, frontier, corpus):
+    def __init__(self, frontier, corpus, parser="bs4"):
         self.frontier = frontier
         self.corpus = corpus
-        self.domainCount = defaultdict(int)
-        self.URLcount = defaultdict(int)
+        self.parser = PARSERS[parser]  # see parsers.PARSERS
+        self.urlCache = URLCache()
+        self.extensionRule = ExtensionRule()
+        self.domainCount = ExactCounter()
+        self.URLcount = ExactCounter()
         
         # analytics 1: subdomains
         # TODO:
@@ -45,6 +50,9 @@ class Crawler:
         """
         Count words from content of valid pages to find the 50 most common words.
         """
+        import requests
+        from bs4 import BeautifulSoup
+
         r = requests.get(url_data["url"])
         content = BeautifulSoup(r.content)
     
@@ -103,7 +111,7 @@ class Crawler:
             for next_link in self.extract_next_links(url_data):
                 if self.is_valid(next_link):
                     # ------ ANALYTICS 1 ------
-                    parsed = urlparse(url)
+                    parsed = self.urlCache.parse(url)
                     subdomain = parsed.netloc.split('.')[0]
                     self.subdomainCount[subdomain] += 1
                     # ------ ANALYTICS 1 ------
@@ -141,9 +149,7 @@ class Crawler:
 
         if url_data["is_redirected"] is True:
             url_data = self.corpus.fetch_url(url_data["url"])
-        content = BeautifulSoup(url_data["content"], "lxml")
-        for a in content.find_all('a', href=True):
-            outputLinks.append(urljoin(url_data["url"], a['href']))
+        outputLinks.extend(self.parser.links(url_data["content"], url_data["url"]))
 
         return outputLinks
 
@@ -153,9 +159,9 @@ class Crawler:
         filter out crawler traps. Duplicated urls will be taken care of by frontier. You don't need to check for duplication
         in this method
         """
-        parsed = urlparse(url)
+        parsed = self.urlCache.parse(url)
 
-        if parsed.scheme not in set(["http", "https"]):
+        if parsed.scheme not in ALLOWED_SCHEMES:
             return False
         try:
             # Very long URL
@@ -163,20 +169,18 @@ class Crawler:
                 return False
 
             # Visiting exact same URL
-            if self.URLcount[url] >= 1:
+            prefix, rest = URLStore.split(url)
+            if self.URLcount.add(rest, prefix) > 1:
                 return False
-            self.URLcount[url] += 1
                 
             # Visiting pages from same link/domain
-            domainName = parsed.netloc + parsed.path
-            self.domainCount[domainName] += 1
-            if self.domainCount[domainName] > 15:
+            if self.domainCount.add(parsed.path, parsed.netloc) > 15:
                 return False
             
             # Many query params or very long query
             query = parsed.query
             if len(query) > 0:
-                query_count = parse_qs(query)
+                query_count = parsed.queryParams
                 if(len(query_count.values()) > 5):
                     return False
 
@@ -199,11 +203,7 @@ class Crawler:
             #         visited_paths.add(p)
 
             return ".ics.uci.edu" in parsed.hostname \
-                   and not re.match(".*\.(css|js|bmp|gif|jpe?g|ico" + "|png|tiff?|mid|mp2|mp3|mp4" \
-                                    + "|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf" \
-                                    + "|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso|epub|dll|cnf|tgz|sha1" \
-                                    + "|thmx|mso|arff|rtf|jar|csv" \
-                                    + "|rm|smil|wmv|swf|wma|zip|rar|gz|pdf)$", parsed.path.lower())
+                   and self.extensionRule(url, parsed)
 
         except TypeError:
             print("TypeError for ", parsed)
@@ -0,0 +1,68 @@
+import os
+import time
+
+
+class StreamingURLSet:
+    """
+    Append-only, file-backed stand-in for a set of urls. Added urls sit in a small buffer that is written out every
+    flush_every urls or flush_interval seconds, whichever comes first, so a crash loses at most one buffer and partial
+    results can be read mid-crawl. Iterating reads the file back in the order urls were first added.
+
+    Membership is answered from a set of 64-bit fingerprints (hash() of each url) rather than the urls themselves, so
+    only new urls are written and the file never holds a url twice. The fingerprints are rebuilt from the file when
+    resuming. Two urls sharing a fingerprint would make the second look seen; at 64 bits that is about one chance in
+    10^7 for a million urls.
+    """
+
+    def __init__(self, path, flush_every=1000, flush_interval=5.0, resume=False):
+        self.path = path
+        self.flushEvery = flush_every
+        self.flushInterval = flush_interval
+        self.appended = 0  # urls written
+        self.buffer = []
+        self.fingerprints = set()
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as urls:
+                self.fingerprints.update(hash(line.rstrip("\n")) for line in urls)
+        self.lastFlush = time.monotonic()
+        self.file = open(path, 'a' if resume else 'w', encoding="utf-8")
+
+    def add(self, url):
+        fingerprint = hash(url)
+        if fingerprint in self.fingerprints:
+            return
+        self.fingerprints.add(fingerprint)
+        self.buffer.append(url)
+        self.appended += 1
+        if len(self.buffer) >= self.flushEvery or time.monotonic() - self.lastFlush >= self.flushInterval:
+            self.flush()
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url):
+        return hash(url) in self.fingerprints
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.file.write("\n".join(self.buffer))
+            self.file.write("\n")
+            self.buffer = []
+        self.file.flush()
+        self.lastFlush = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __iter__(self):
+        if not self.file.closed:
+            self.flush()
+        with open(self.path, encoding="utf-8") as urls:
+            for line in urls:
+                yield line.rstrip("\n")
@@ -0,0 +1,241 @@
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from url_cache import URLCache
+
+logger = logging.getLogger(__name__)
+
+
+class HttpCorpus:
+    """
+    Corpus stand-in that fetches live pages with requests, through one pooled Session (keep-alive connections shared
+    by the fetch threads). fetch_url returns the same dict as the corpus. Every url counts as part of the corpus;
+    missing pages come back as 404s.
+
+    A redirect's final page is kept for a moment, so the crawler's follow-up fetch of final_url is not sent again.
+    """
+
+    def __init__(self, timeout=10.0, pool_size=32, proxies=None, user_agent="IR-crawler", recent=256):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+        if proxies is not None:
+            self.session.proxies.update(proxies)
+        self.recent = OrderedDict()  # {final url: url_data}, redirect targets just fetched
+        self.recentSize = recent
+        self.lock = threading.Lock()
+
+    def fetch_url(self, url):
+        with self.lock:
+            url_data = self.recent.pop(url, None)
+        if url_data is not None:
+            return url_data
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning("Failed to fetch %s: %s", url, e)
+            return {"url": url, "content": None, "size": 0, "content_type": None, "http_code": 0,
+                    "is_redirected": False, "final_url": None}
+
+        content = response.content
+        url_data = {"url": url, "content": content, "size": len(content),
+                    "content_type": response.headers.get("Content-Type"), "http_code": response.status_code,
+                    "is_redirected": len(response.history) > 0,
+                    "final_url": response.url if len(response.history) > 0 else None}
+        if url_data["is_redirected"]:
+            with self.lock:
+                self.recent[response.url] = dict(url_data, url=response.url, is_redirected=False, final_url=None)
+                if len(self.recent) > self.recentSize:
+                    self.recent.popitem(last=False)
+        return url_data
+
+    def get_file_name(self, url):
+        return url
+
+    def close(self):
+        self.session.close()
+
+
+class TokenBucket:
+    """
+    Crawl-delay limiter for one host: one token every `delay` seconds, holding at most `burst`.
+    """
+
+    def __init__(self, delay, burst=1):
+        self.delay = delay
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    def refill(self, now):
+        if self.delay > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.last) / self.delay)
+        else:
+            self.tokens = self.burst
+        self.last = now
+
+    def take(self, now):
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def ready_at(self, now):
+        self.refill(now)
+        return now if self.tokens >= 1 else now + (1 - self.tokens) * self.delay
+
+
+class HostScheduler:
+    """
+    Host-aware priority queue. Urls wait in one FIFO per host; a host is in the ready heap, keyed by the time its
+    token bucket next allows a request, only while it has urls waiting and fewer than per_host requests in flight.
+    pop() hands out the url of whichever host is ready first, so a slow or rate-limited host never holds up the others.
+    """
+
+    def __init__(self, per_host=2, crawl_delay=1.0, burst=1, host_delays=None):
+        self.perHost = per_host
+        self.crawlDelay = crawl_delay
+        self.burst = burst
+        self.hostDelays = host_delays or {}  # {host: crawl delay}, overriding crawl_delay
+        self.urlCache = URLCache()
+        self.queues = defaultdict(deque)  # {host: urls waiting}
+        self.buckets = {}  # {host: TokenBucket}
+        self.inFlight = defaultdict(int)
+        self.heap = []  # (ready time, sequence, host)
+        self.scheduled = set()  # hosts in the heap
+        self.sequence = 0
+        self.waiting = 0
+
+    def push(self, url):
+        host = self.urlCache.parse(url).netloc
+        self.queues[host].append(url)
+        self.waiting += 1
+        self.schedule(host, time.monotonic())
+
+    def schedule(self, host, now):
+        if host in self.scheduled or len(self.queues[host]) == 0 or self.inFlight[host] >= self.perHost:
+            return
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(self.hostDelays.get(host, self.crawlDelay), self.burst)
+        self.sequence += 1
+        heapq.heappush(self.heap, (bucket.ready_at(now), self.sequence, host))
+        self.scheduled.add(host)
+
+    def pop(self, now):
+        """
+        The next (url, host) allowed to be fetched now, or None.
+        """
+        while len(self.heap) > 0 and self.heap[0][0] <= now:
+            _, _, host = heapq.heappop(self.heap)
+            self.scheduled.discard(host)
+            if not self.buckets[host].take(now):
+                self.schedule(host, now)
+                continue
+            url = self.queues[host].popleft()
+            self.waiting -= 1
+            self.inFlight[host] += 1
+            self.schedule(host, now)
+            return url, host
+        return None
+
+    def done(self, host):
+        self.inFlight[host] -= 1
+        self.schedule(host, time.monotonic())
+
+    def next_ready(self):
+        return self.heap[0][0] if len(self.heap) > 0 else None
+
+    def __len__(self):
+        return self.waiting
+
+
+class AsyncCrawler:
+    """
+    asyncio driver for a Crawler: up to `concurrency` pages are fetched at once on a thread pool (requests is
+    blocking), at most per_host of them from one host and no faster than its crawl delay allows. Each fetched page is
+    handed to the crawler's own process_page (extract_next_links, is_valid, the frontier, analytics) on the event loop
+    thread, so the Crawler is never used from two threads. New frontier urls are moved into the host scheduler after
+    every page.
+
+    Pages are processed in the order their fetches finish, so the crawl order differs from the serial loop.
+    """
+
+    def __init__(self, crawler, concurrency=32, per_host=2, crawl_delay=1.0, burst=1, host_delays=None):
+        self.crawler = crawler
+        self.concurrency = concurrency
+        self.scheduler = HostScheduler(per_host, crawl_delay, burst, host_delays)
+        self.pages = 0
+
+    def admit(self):
+        frontier = self.crawler.frontier
+        # urls in the scheduler have left the frontier, so a due checkpoint waits until they are all crawled
+        if self.crawler.checkpointDue:
+            return
+        while frontier.has_next_url():
+            self.scheduler.push(frontier.get_next_url())
+
+    async def fetch(self, pool, url, host):
+        loop = asyncio.get_running_loop()
+        logger.info("Fetching URL %s ... Fetched: %s, Queue size: %s", url, self.pages, len(self.scheduler))
+        url_data = await loop.run_in_executor(pool, self.crawler.corpus.fetch_url, url)
+        return url, host, url_data
+
+    async def crawl(self):
+        tasks = set()
+        self.admit()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            while True:
+                while len(tasks) < self.concurrency:
+                    ready = self.scheduler.pop(time.monotonic())
+                    if ready is None:
+                        break
+                    tasks.add(asyncio.ensure_future(self.fetch(pool, *ready)))
+
+                if len(tasks) == 0 and len(self.scheduler) == 0:
+                    break
+
+                # with every slot taken a ready host cannot start anyway, so only a finished fetch is worth waking for
+                wake = self.scheduler.next_ready() if len(tasks) < self.concurrency else None
+                timeout = max(0.0, wake - time.monotonic()) if wake is not None else None
+                if len(tasks) == 0:
+                    await asyncio.sleep(timeout)
+                    continue
+
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    url, host, url_data = task.result()
+                    self.scheduler.done(host)
+                    self.crawler.stats.begin_page()
+                    links = self.crawler.process_page(url, url_data)
+                    self.crawler.stats.end_page(len(links))
+                    self.pages += 1
+                if self.crawler.checkpointDue and len(tasks) == 0 and len(self.scheduler) == 0:
+                    self.crawler.save_checkpoint()
+                self.admit()
+
+    def start_crawling(self):
+        """
+        Crawl until the frontier and the scheduler run dry, then write the analytics as start_crawling does.
+        """
+        try:
+            asyncio.run(self.crawl())
+        finally:
+            if self.crawler.analyticsDir is not None:
+                self.crawler.downloadedURLS.flush()
+                self.crawler.traps.flush()
+        self.crawler.finish_crawl()
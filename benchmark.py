@@ -0,0 +1,634 @@
+"""
+Benchmarks for the crawler hot paths, run against a synthetic in-memory corpus and frontier so results are
+reproducible without the real corpus. Micro-benchmarks (extract_next_links, count_words, is_valid, analytics) and an
+end-to-end start_crawling run are timed for each crawler variant; results are printed and written as JSON along with
+the git commit, so runs can be compared across commits.
+
+    python benchmark.py --pages 2000 --output bench.json
+    python benchmark.py is_valid start_crawling --variants crawler _crawler --trap-ratio 0.2
+    python benchmark.py sharded --pages 20000
+    python benchmark.py cold_start --repeat 10
+    python benchmark.py parsers --pages 5000
+"""
+import argparse
+import http.server
+import importlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import counters
+import crawler
+import parsers
+import shard
+import traps
+import urlstore
+
+WORDS = ["crawler", "research", "informatics", "student", "faculty", "course", "project", "graph", "data", "machine",
+         "learning", "systems", "theory", "vision", "software", "network", "security", "database", "the", "and", "of"]
+HOSTS = ["www.ics.uci.edu", "vision.ics.uci.edu", "cml.ics.uci.edu", "mlphysics.ics.uci.edu", "cert.ics.uci.edu"]
+VARIANTS = ["crawler", "_crawler", "draft_crawler"]
+
+
+class SyntheticCorpus:
+    """
+    Stand-in for the corpus: `pages` generated html pages spread over a few ics hosts, each with about
+    `links_per_page` links to other pages, built from a fixed seed. A share of the links go to urls outside the
+    corpus (missing_ratio), into crawler traps (trap_ratio) or through redirecting aliases of a page (redirect_ratio).
+
+    Each host has three trap chains of trap_depth pages (a calendar, a directory repeating itself and a session id
+    query), every page of which links to the next one. Trap links from ordinary pages go to the first page of a
+    chain, the way a site links to this month of its calendar. trapURLs holds every trap page.
+    """
+
+    def __init__(self, pages=1000, links_per_page=50, missing_ratio=0.1, words_per_page=300, seed=0, trap_ratio=0.05,
+                 redirect_ratio=0.05, trap_depth=20):
+        self.random = random.Random(seed)
+        self.urls = ["http://{}/page{}.html".format(HOSTS[i % len(HOSTS)], i) for i in range(pages)]
+        self.content = {}
+        self.redirects = {}  # {alias url: final url}
+        self.trapURLs = set()
+
+        trap_entries = []
+        for host in HOSTS:
+            for chain in self.trap_chains(host, trap_depth):
+                trap_entries.append(chain[0])
+                self.trapURLs.update(chain)
+                for url, next_url in zip(chain, chain[1:] + [None]):
+                    self.content[url] = self.page([next_url] if next_url is not None else [], words_per_page // 10)
+
+        aliases = []
+        if redirect_ratio > 0:
+            for i, url in enumerate(self.urls):
+                if self.random.random() < redirect_ratio:
+                    alias = "http://{}/go/{}".format(HOSTS[i % len(HOSTS)], i)
+                    self.redirects[alias] = url
+                    aliases.append(alias)
+
+        for url in self.urls:
+            links = []
+            for _ in range(self.random.randint(links_per_page // 2, links_per_page * 3 // 2)):
+                roll = self.random.random()
+                if roll < missing_ratio:
+                    links.append("/missing{}.html".format(self.random.randrange(pages)))
+                elif roll < missing_ratio + trap_ratio:
+                    links.append(self.random.choice(trap_entries))
+                elif roll < missing_ratio + trap_ratio + redirect_ratio and len(aliases) > 0:
+                    links.append(self.random.choice(aliases))
+                else:
+                    links.append(self.random.choice(self.urls))
+            self.content[url] = self.page(links, words_per_page)
+
+        known = list(self.content) + aliases
+        self.fileNames = {url.split("://", 1)[1]: str(i) for i, url in enumerate(known)}
+
+    def trap_chains(self, host, depth):
+        return [["http://{}/calendar/{}-{:02d}/".format(host, 2000 + i // 12, i % 12 + 1) for i in range(depth)],
+                ["http://{}/{}index.html".format(host, "people/" * (i + 1)) for i in range(depth)],
+                ["http://{}/search?q=ics&page={}&sid={:032x}".format(host, i, self.random.getrandbits(128))
+                 for i in range(depth)]]
+
+    def page(self, links, words_per_page):
+        text = " ".join(self.random.choice(WORDS) for _ in range(words_per_page))
+        anchors = "".join('<a href="{}">link</a>\n'.format(link) for link in links)
+        return "<html><body><p>{}</p>\n{}</body></html>".format(text, anchors).encode("utf-8")
+
+    def seeds(self):
+        return self.urls[:len(HOSTS)]
+
+    def fetch_url(self, url):
+        final_url = self.redirects.get(url)
+        content = self.content.get(final_url or url)
+        return {"url": url, "content": content, "size": len(content) if content is not None else 0,
+                "content_type": "text/html", "http_code": 200 if content is not None else 404,
+                "is_redirected": final_url is not None, "final_url": final_url}
+
+    def get_file_name(self, url):
+        # same work as the real corpus lookup: parse the url, drop the scheme, look it up, build the path
+        url = url.strip()
+        parsed = urlparse(url)
+        name = self.fileNames.get(url[len(parsed.scheme) + 3:])
+        return os.path.join("corpus", name) if name is not None else None
+
+    def get_file_names(self, urls):
+        return [self.get_file_name(url) for url in urls]
+
+
+class SyntheticFrontier:
+    """
+    Stand-in for the FIFO frontier: a queue plus the set of urls ever added.
+    """
+
+    def __init__(self, seeds=()):
+        self.queue = deque()
+        self.urls = set()
+        self.fetched = 0
+        for url in seeds:
+            self.add_url(url)
+
+    def add_url(self, url):
+        if url not in self.urls:
+            self.urls.add(url)
+            self.queue.append(url)
+
+    def add_urls(self, urls):
+        for url in urls:
+            self.add_url(url)
+
+    def has_next_url(self):
+        return len(self.queue) > 0
+
+    def get_next_url(self):
+        self.fetched += 1
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class LocalSite:
+    """
+    Serves a SyntheticCorpus over http on localhost for live crawls. It answers as an http proxy, so the crawler keeps
+    the corpus' own urls: give requests proxies={"http": site.address}. Redirect aliases answer 302, missing pages 404.
+    Every response waits `latency` seconds, or the delay given for its host in slow_hosts.
+    """
+
+    def __init__(self, corpus, latency=0.005, slow_hosts=None):
+        self.corpus = corpus
+        self.latency = latency
+        self.slowHosts = slow_hosts or {}
+        self.server = None
+        self.address = None
+
+    def start(self):
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = self.path if "://" in self.path else "http://{}{}".format(self.headers["Host"], self.path)
+                time.sleep(site.slowHosts.get(urlparse(url).hostname, site.latency))
+                final_url = site.corpus.redirects.get(url)
+                content = site.corpus.content.get(url)
+                if final_url is not None:
+                    self.send_response(302)
+                    self.send_header("Location", final_url)
+                    content = b""
+                elif content is not None:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html")
+                else:
+                    self.send_response(404)
+                    content = b""
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.address = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def timed(function, repeat=3):
+    """
+    Best wall time of `repeat` runs, in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def recorded_links(corpus):
+    """
+    The out-links of every page, in corpus order.
+    """
+    recorder = crawler.Crawler(SyntheticFrontier(), corpus)
+    return [recorder.extract_next_links(corpus.fetch_url(url)) for url in corpus.urls]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def in_directory(path):
+    """
+    Run a block inside a directory, for crawler variants that write analytics.txt to the working directory.
+    """
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+
+
+def per_variant(bench):
+    """
+    Run a micro-benchmark against each crawler variant. A variant that cannot be imported here, or that fails the
+    benchmark, gets its error recorded instead of a timing.
+    """
+    def run(corpus, variants=VARIANTS, repeat=3):
+        results = {}
+        for name in variants:
+            try:
+                module = importlib.import_module(name)
+                results[name] = bench(module, corpus, repeat)
+            except Exception as e:
+                results[name] = {"error": "{}: {}".format(type(e).__name__, e)}
+        return results
+    return run
+
+
+@per_variant
+def bench_extract_next_links(module, corpus, repeat):
+    pages = [corpus.fetch_url(url) for url in corpus.urls + sorted(corpus.redirects)]
+    links = [0]
+
+    def run():
+        extractor = module.Crawler(SyntheticFrontier(), corpus)
+        links[0] = sum(len(extractor.extract_next_links(url_data)) for url_data in pages)
+
+    seconds = timed(run, repeat)
+    return {"pages": len(pages), "links": links[0], "seconds": seconds, "pages_per_second": len(pages) / seconds}
+
+
+@per_variant
+def bench_count_words(module, corpus, repeat):
+    if module is not crawler:
+        # _crawler.count_words downloads the page again with requests, draft_crawler has it commented out
+        return {"skipped": "count_words is not usable offline in this variant"}
+    from bs4 import BeautifulSoup  # the crawler only imports it on first use
+
+    pages = [(url, BeautifulSoup(corpus.content[url], features="lxml")) for url in corpus.urls]
+
+    def run():
+        counter = module.Crawler(SyntheticFrontier(), corpus)
+        for url, content in pages:
+            counter.count_words(content, url)
+
+    seconds = timed(run, repeat)
+    return {"pages": len(pages), "seconds": seconds, "pages_per_second": len(pages) / seconds}
+
+
+@per_variant
+def bench_is_valid(module, corpus, repeat):
+    links = [link for page in recorded_links(corpus) for link in page]
+    accepted = [0]
+
+    def run():
+        validator = module.Crawler(SyntheticFrontier(), corpus)
+        accepted[0] = sum(1 for link in links if validator.is_valid(link))
+
+    seconds = timed(run, repeat)
+    return {"links": len(links), "accepted": accepted[0], "seconds": seconds, "links_per_second": len(links) / seconds}
+
+
+@per_variant
+def bench_start_crawling(module, corpus, repeat):
+    """
+    End-to-end crawl from one seed per host, then the analytics report of the finished crawl.
+    """
+    runs = []
+
+    def run():
+        with tempfile.TemporaryDirectory() as directory, in_directory(directory):
+            crawl = module.Crawler(SyntheticFrontier(corpus.seeds()), corpus)
+            crawl.start_crawling()
+            runs.append(crawl)
+
+    seconds = timed(run, repeat)
+    crawl = runs[-1]
+    return {"pages": crawl.frontier.fetched, "downloaded": len(list(crawl.downloadedURLS)),
+            "traps": len(list(crawl.traps)), "seconds": seconds, "pages_per_second": crawl.frontier.fetched / seconds}
+
+
+@per_variant
+def bench_analytics(module, corpus, repeat):
+    with tempfile.TemporaryDirectory() as directory, in_directory(directory):
+        crawl = module.Crawler(SyntheticFrontier(corpus.seeds()), corpus)
+        crawl.start_crawling()
+        seconds = timed(crawl.analytics, repeat)
+    return {"downloaded": len(list(crawl.downloadedURLS)), "seconds": seconds}
+
+
+def bench_admission(corpus, variants=VARIANTS, repeat=3):
+    stream = recorded_links(corpus)
+    links = sum(len(page) for page in stream)
+
+    def run(batched):
+        def crawl():
+            admitting = crawler.Crawler(SyntheticFrontier(), corpus, batch_admission=batched)
+            admit = admitting.admit_links_batched if batched else admitting.admit_links
+            for page in stream:
+                admit(page)
+        return crawl
+
+    per_link = timed(run(False), repeat)
+    batched = timed(run(True), repeat)
+    return {"links": links, "per_link_seconds": per_link, "batched_seconds": batched,
+            "speedup": per_link / batched if batched > 0 else None}
+
+
+def bench_sharded(corpus, variants=VARIANTS, repeat=3):
+    """
+    End-to-end crawl split over 1, 2, 4, ... shards, up to the number of cores.
+    """
+    results = {}
+    shards = 1
+    while shards <= max(1, os.cpu_count() or 1):
+        runs = []
+
+        def run():
+            with tempfile.TemporaryDirectory() as directory, in_directory(directory):
+                sharded = shard.ShardedCrawl(corpus, corpus.seeds(), shards=shards)
+                runs.append((sharded, sharded.start_crawling()))
+
+        seconds = timed(run, repeat)
+        sharded, merged = runs[-1]
+        results[shards] = {"pages": merged.pagesCrawled, "exchanged": sharded.exchanged, "seconds": seconds,
+                           "pages_per_second": merged.pagesCrawled / seconds}
+        shards *= 2
+    return results
+
+
+def bench_traps(corpus, variants=VARIANTS, repeat=3):
+    """
+    Precision and recall of trap detection against the corpus' trap pages, with and without the template rule, from
+    an end-to-end crawl. A url counts as flagged if it was rejected and never accepted; trap pages fetched are the
+    frontier waste.
+    """
+    results = {}
+    for name, templates in (("default", None), ("templates", traps.TemplateTrapRule)):
+        runs = []
+
+        def run():
+            with tempfile.TemporaryDirectory() as directory, in_directory(directory):
+                crawl = crawler.Crawler(SyntheticFrontier(corpus.seeds()), corpus,
+                                        trap_templates=templates() if templates is not None else None)
+                crawl.start_crawling()
+                runs.append(crawl)
+
+        seconds = timed(run, repeat)
+        crawl = runs[-1]
+        downloaded = set(crawl.downloadedURLS)
+        flagged = set(crawl.traps) - downloaded
+        caught = len(flagged & corpus.trapURLs)
+        offered = len((flagged | downloaded) & corpus.trapURLs)
+        fetched = crawl.frontier.urls
+        results[name] = {"pages": len(fetched), "trap_pages_fetched": len(fetched & corpus.trapURLs),
+                         "real_pages_fetched": len(fetched - corpus.trapURLs),
+                         "precision": caught / len(flagged) if len(flagged) > 0 else None,
+                         "recall": caught / offered if offered > 0 else None, "seconds": seconds}
+        if templates is not None:
+            # the template rule on its own: urls it would reject, whichever rule got to them first
+            rule = crawl.urlFilter.parsedRules[-1]
+            by_template = set(url for url in flagged
+                              if traps.url_template(crawl.urlCache.parse(url))[0] in rule.trapTemplates)
+            results[name]["template_precision"] = (len(by_template & corpus.trapURLs) / len(by_template)
+                                                   if len(by_template) > 0 else None)
+            results[name]["trap_templates"] = rule.report()["trap_templates"]
+    return results
+
+
+def bench_trap_counters(corpus, variants=VARIANTS, repeat=3):
+    """
+    Memory and false-trap rate of each trap counter backend. Every link in the corpus is replayed through the repeat
+    rule's counter (path under its host, over 10) and the subdirectory rule's (directory, over 50), side by side with
+    exact counts; a false trap is a link the backend rejects that exact counts would have let through.
+    """
+    repeat_keys = []
+    subdirectory_keys = []
+    for page in recorded_links(corpus):
+        for link in page:
+            parsed = urlparse(link)
+            repeat_keys.append((parsed.path, parsed.netloc))
+            subdirectory_keys.append((parsed.path[:parsed.path.rfind('/')], ""))
+
+    results = {"links": len(repeat_keys)}
+    backends = (("exact", {}), ("count-min", {}), ("count-min", {"width": 16384, "depth": 4}),
+                ("count-min", {"width": 1024, "depth": 4}))
+    for backend, options in backends:
+        name = backend + "".join(" {}={}".format(key, value) for key, value in sorted(options.items()))
+        results[name] = {}
+        for rule, keys, max_count in (("repeat", repeat_keys, 10), ("subdirectory", subdirectory_keys, 50)):
+            counter = counters.make_counter(backend, **options)
+            rate = counters.false_trap_rate(keys, counter, max_count)
+            results[name][rule] = {"memory_bytes": counter.memory_bytes(), "false_trap_rate": rate}
+    return results
+
+
+def bench_url_store(corpus, variants=VARIANTS, repeat=3):
+    """
+    Memory per url and add/lookup time of a URLStore against a plain set, over every distinct link in the corpus. The
+    set is charged for its own copies of the url strings, as downloadedURLS is in a crawl.
+    """
+    links = list(dict.fromkeys(link for page in recorded_links(corpus) for link in page))
+    results = {"urls": len(links)}
+    for name, build in (("set", set), ("url_store", urlstore.URLStore)):
+        tracemalloc.start()
+        store = build(link.encode("utf-8").decode("utf-8") for link in links)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[name] = {"bytes": size, "bytes_per_url": size / len(links),
+                         "add_seconds": timed(lambda: build(links), repeat),
+                         "lookup_seconds": timed(lambda: sum(1 for link in links if link in store), repeat)}
+    return results
+
+
+def bench_async(corpus, variants=VARIANTS, repeat=1, latency=0.005, slow_hosts=None):
+    """
+    Live crawl of the corpus served by a LocalSite: the serial loop against the asyncio driver (no crawl delay, four
+    requests per host at most), in pages per second.
+    """
+    import async_crawler  # needs requests, which nothing else here does
+
+    site = LocalSite(corpus, latency, slow_hosts).start()
+    try:
+        results = {"latency": latency, "slow_hosts": slow_hosts or {}}
+        for name in ("serial", "async"):
+            runs = []
+
+            def run():
+                with tempfile.TemporaryDirectory() as directory, in_directory(directory):
+                    http_corpus = async_crawler.HttpCorpus(proxies={"http": site.address})
+                    crawl = crawler.Crawler(SyntheticFrontier(corpus.seeds()), http_corpus)
+                    if name == "serial":
+                        crawl.start_crawling()
+                    else:
+                        async_crawler.AsyncCrawler(crawl, concurrency=32, per_host=4, crawl_delay=0.0).start_crawling()
+                    http_corpus.close()
+                    runs.append(crawl)
+
+            seconds = timed(run, repeat)
+            results[name] = {"pages": runs[-1].pagesCrawled, "seconds": seconds,
+                             "pages_per_second": runs[-1].pagesCrawled / seconds}
+        results["speedup"] = results["serial"]["seconds"] / results["async"]["seconds"]
+        return results
+    finally:
+        site.stop()
+
+
+# run in a fresh interpreter by bench_cold_start: time the import and the first page, and list the heavy modules loaded
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as module
+imported = time.perf_counter()
+module.Crawler(None, None).extract_next_links({page!r})
+ready = time.perf_counter()
+print(json.dumps({{"import_seconds": imported - start, "first_page_seconds": ready - imported,
+                  "heavy_modules": sorted(name for name in {heavy!r} if name in sys.modules)}}))
+"""
+HEAVY_MODULES = ["bs4", "lxml", "requests", "numpy", "sqlite3", "multiprocessing", "cProfile", "pstats"]
+
+
+def bench_cold_start(corpus, variants=VARIANTS, repeat=3):
+    """
+    Startup cost of each variant, as a short incremental crawl job pays it: a fresh interpreter imports the module and
+    extracts the links of one page. Reports the import and first-page times measured inside the process, the whole
+    process's wall time less that of an interpreter that imports nothing, and which heavy modules ended up loaded.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [directory, environment.get("PYTHONPATH")]))
+    page = corpus.fetch_url(corpus.seeds()[0])
+
+    def launch(code):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=directory, env=environment,
+                                         stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start, output
+
+    interpreter = min(launch("pass")[0] for _ in range(repeat))
+    results = {"interpreter_seconds": interpreter}
+    for name in variants:
+        code = COLD_START.format(module=name, page=page, heavy=HEAVY_MODULES)
+        try:
+            runs = [launch(code) for _ in range(repeat)]
+        except subprocess.CalledProcessError as e:
+            results[name] = {"error": "exit code {}".format(e.returncode)}
+            continue
+        reports = [json.loads(output) for _, output in runs]
+        results[name] = {"process_seconds": min(seconds for seconds, _ in runs) - interpreter,
+                         "import_seconds": min(report["import_seconds"] for report in reports),
+                         "first_page_seconds": min(report["first_page_seconds"] for report in reports),
+                         "heavy_modules": reports[-1]["heavy_modules"]}
+    return results
+
+
+def bench_parsers(corpus, variants=VARIANTS, repeat=3):
+    """
+    Each parser backend over every corpus page, in bytes per second, with its link and word recall and precision
+    against BeautifulSoup. Then the pages are parsed the way the crawler's parser="auto" does, through a
+    ParserSelector, to show which backend it settles on.
+    """
+    pages = [corpus.fetch_url(url) for url in corpus.urls]
+    size = sum(len(page["content"]) for page in pages)
+    reference = [parsers.PARSERS["bs4"].parse(page["content"], page["url"]) for page in pages]
+    results = {"pages": len(pages), "bytes": size}
+    for name, backend in sorted(parsers.PARSERS.items()):
+        parsed = []
+        seconds = timed(lambda: parsed.append([backend.parse(page["content"], page["url"]) for page in pages]),
+                        repeat)
+        results[name] = {"seconds": seconds, "bytes_per_second": size / seconds,
+                         "link_recall": sum(parsers.recall(links, expected[0]) for (links, _, _), expected
+                                            in zip(parsed[-1], reference)) / len(pages),
+                         "word_recall": sum(parsers.recall(text.lower().split(), expected[1].lower().split())
+                                            for (_, text, _), expected in zip(parsed[-1], reference)) / len(pages),
+                         "link_precision": sum(parsers.precision(links, expected[0]) for (links, _, _), expected
+                                               in zip(parsed[-1], reference)) / len(pages),
+                         "word_precision": sum(parsers.precision(text.lower().split(), expected[1].lower().split())
+                                               for (_, text, _), expected in zip(parsed[-1], reference)) / len(pages)}
+
+    selector = parsers.ParserSelector()
+    for page in pages:
+        kind, name = selector.choose(page)
+        started = time.perf_counter()
+        crawler.extract_document(page, parser=name)
+        selector.observe(kind, name, page, time.perf_counter() - started)
+    results["auto"] = selector.report()
+    return results
+
+
+BENCHMARKS = {
+    "extract_next_links": bench_extract_next_links,
+    "count_words": bench_count_words,
+    "is_valid": bench_is_valid,
+    "analytics": bench_analytics,
+    "start_crawling": bench_start_crawling,
+    "admission": bench_admission,
+    "sharded": bench_sharded,
+    "traps": bench_traps,
+    "trap_counters": bench_trap_counters,
+    "url_store": bench_url_store,
+    "async": bench_async,
+    "cold_start": bench_cold_start,
+    "parsers": bench_parsers,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, help="crawler modules to compare")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--links-per-page", type=int, default=50)
+    parser.add_argument("--missing-ratio", type=float, default=0.1)
+    parser.add_argument("--trap-ratio", type=float, default=0.05)
+    parser.add_argument("--redirect-ratio", type=float, default=0.05)
+    parser.add_argument("--trap-depth", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing; the best one is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(args.pages, args.links_per_page, args.missing_ratio, seed=args.seed,
+                             trap_ratio=args.trap_ratio, redirect_ratio=args.redirect_ratio,
+                             trap_depth=args.trap_depth)
+    results = {"commit": git_commit(), "python": platform.python_version(), "time": time.time(),
+               "corpus": {"pages": args.pages, "links_per_page": args.links_per_page,
+                          "missing_ratio": args.missing_ratio, "trap_ratio": args.trap_ratio,
+                          "redirect_ratio": args.redirect_ratio, "trap_depth": args.trap_depth, "seed": args.seed},
+               "benchmarks": {}}
+    for name in args.benchmarks:
+        try:
+            results["benchmarks"][name] = BENCHMARKS[name](corpus, args.variants, args.repeat)
+        except ImportError as e:
+            results["benchmarks"][name] = {"error": "{}: {}".format(type(e).__name__, e)}
+        print(name, json.dumps(results["benchmarks"][name]))
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
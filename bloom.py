@@ -0,0 +1,74 @@
+import math
+
+
+class BloomFilter:
+    """
+    Fixed-size "probably seen" set of strings. No false negatives; false positives at about error_rate once
+    capacity items have been added.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=1e-6):
+        self.capacity = capacity
+        self.errorRate = error_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashCount = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # the filter lives in memory for one crawl only, so Python's own (per-process) string hash is good enough
+        h = hash(item) & 0xFFFFFFFFFFFFFFFF
+        h1 = h & 0xFFFFFFFF
+        h2 = h >> 32 | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashCount)]
+
+    def add(self, item):
+        bits = self.bits
+        for p in self._positions(item):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        for p in self._positions(item):
+            if not bits[p >> 3] >> (p & 7) & 1:
+                return False
+        return True
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows instead of filling up: once the newest BloomFilter holds its capacity, another one twice
+    as large, with half the error rate, is started beside it. An item is in the set if any filter has it, so the
+    false-positive rate stays below 2 * error_rate however many items are added, at the cost of one more lookup per
+    filter.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=1e-6, growth=2, tightening=0.5):
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = [BloomFilter(capacity, error_rate * (1 - tightening))]
+
+    def add(self, item):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * self.growth, current.errorRate * self.tightening)
+            self.filters.append(current)
+        current.add(item)
+
+    def __contains__(self, item):
+        for bloom in self.filters:
+            if item in bloom:
+                return True
+        return False
+
+    @property
+    def count(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def memory_bytes(self):
+        return sum(bloom.memory_bytes() for bloom in self.filters)
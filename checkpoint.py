@@ -0,0 +1,189 @@
+import logging
+import marshal
+import os
+import struct
+import zlib
+from array import array
+from collections import Counter
+
+from analytics_sink import StreamingURLSet
+from counters import ExactCounter, CountMinSketch
+from topk import SpaceSaving
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+RECORD_HEADER = struct.Struct("<I")  # length of the compressed record that follows
+
+
+def counter_state(counter, full):
+    if isinstance(counter, ExactCounter):
+        if full or counter.changed is None:
+            if counter.changed is not None:
+                counter.track_changes()  # every key is in this record, so the next one starts from here
+            return ["exact", counter.total, [(p, k, c) for (p, k), c in counter.items()]]
+        return ["exact", counter.total, counter.pop_changes()]
+    if isinstance(counter, CountMinSketch):
+        return ["count-min", counter.total, [counter.width, counter.depth, [row.tobytes() for row in counter.rows]]]
+    raise TypeError("cannot checkpoint trap counter {!r}".format(counter))
+
+
+def restore_counter(counter, state):
+    kind, total, data = state
+    counter.total = total
+    if kind == "exact":
+        for partition, key, count in data:
+            counter.set(key, partition, count)
+    else:
+        counter.width, counter.depth, rows = data
+        counter.rows = [array('I', row) for row in rows]
+
+
+class Checkpointer:
+    """
+    Periodically saves Crawler state to <directory>/crawler.ckpt so an interrupted crawl can resume where it stopped.
+
+    The file is a log of records, each a 4-byte length followed by a zlib-compressed marshal dump of plain dicts,
+    lists and ints; the Crawler object itself is never pickled. A full record holds the whole state. The records after
+    it only hold what changed since the one before: new downloaded and trap urls, the word counts added, and the exact
+    trap-counter keys that moved. Small or fixed-size parts (analytics 1, 2 and 4, count-min rows, a SpaceSaving
+    table) are written whole every time. Every compact_every records the log is rewritten as one full record. A
+    record cut short by a crash is ignored on load.
+
+    The frontier is not part of it; when the frontier has a save_to_file method, it is called at each checkpoint.
+    """
+
+    def __init__(self, directory, every=1000, compact_every=50):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "crawler.ckpt")
+        self.every = every
+        self.compactEvery = compact_every
+        self.records = 0
+
+        # changes since the last checkpoint
+        self.newDownloaded = []
+        self.newTraps = []
+        self.newWords = Counter()
+
+    def start(self, crawler):
+        for counter in (crawler.domainCount, crawler.subdirectoryCount):
+            if isinstance(counter, ExactCounter):
+                counter.track_changes()
+
+    def note_urls(self, crawler, new_downloaded, new_traps):
+        """
+        Remember the urls a page added to the crawler's sets for the first time.
+        """
+        if not isinstance(crawler.downloadedURLS, StreamingURLSet):
+            self.newDownloaded.extend(new_downloaded)
+            self.newTraps.extend(new_traps)
+
+    def note_words(self, words):
+        self.newWords.update(words)
+
+    def save(self, crawler, full=False):
+        full = full or self.records == 0 or self.records >= self.compactEvery
+        data = zlib.compress(marshal.dumps(self.record(crawler, full)))
+
+        if full:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'wb') as checkpoint_file:
+                checkpoint_file.write(RECORD_HEADER.pack(len(data)) + data)
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+            os.replace(temp_path, self.path)
+            self.records = 1
+        else:
+            with open(self.path, 'ab') as checkpoint_file:
+                checkpoint_file.write(RECORD_HEADER.pack(len(data)) + data)
+            self.records += 1
+
+        self.newDownloaded = []
+        self.newTraps = []
+        self.newWords = Counter()
+
+        if hasattr(crawler.frontier, "save_to_file"):
+            crawler.frontier.save_to_file()
+        logger.info("Checkpoint saved after %s pages (%s, %s bytes)", crawler.pagesCrawled,
+                    "full" if full else "incremental", len(data))
+
+    def record(self, crawler, full):
+        record = {"version": FORMAT_VERSION,
+                  "full": full,
+                  "pages": crawler.pagesCrawled,
+                  "domainCount": counter_state(crawler.domainCount, full),
+                  "subdirectoryCount": counter_state(crawler.subdirectoryCount, full),
+                  "subdomainCount": dict(crawler.subdomainCount),
+                  "maxOutLinks": list(crawler.maxOutLinks),
+                  "longestPage": list(crawler.longestPage),
+                  "truncatedPages": dict(crawler.truncatedPages)}
+
+        if isinstance(crawler.commonWords, SpaceSaving):
+            words = crawler.commonWords
+            record["commonWords"] = ["space-saving", [words.capacity, words.total, words.counts, words.errors]]
+        else:
+            record["commonWords"] = ["counts", dict(crawler.commonWords) if full else dict(self.newWords)]
+
+        # streamed url files are already on disk
+        if not isinstance(crawler.downloadedURLS, StreamingURLSet):
+            record["downloadedURLS"] = list(crawler.downloadedURLS) if full else self.newDownloaded
+            record["traps"] = list(crawler.traps) if full else self.newTraps
+
+        return record
+
+    def load_records(self):
+        records = []
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path, 'rb') as checkpoint_file:
+            while True:
+                header = checkpoint_file.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                data = checkpoint_file.read(RECORD_HEADER.unpack(header)[0])
+                try:
+                    record = marshal.loads(zlib.decompress(data))
+                except (zlib.error, EOFError, ValueError):
+                    logger.warning("Ignoring a damaged record at the end of %s", self.path)
+                    break
+                if record["version"] != FORMAT_VERSION:
+                    raise ValueError("checkpoint format {} is not supported".format(record["version"]))
+                records.append(record)
+        return records
+
+    def restore(self, crawler):
+        """
+        Load the saved state into a freshly built crawler. Returns False when there is nothing to resume from.
+        """
+        records = self.load_records()
+        for record in records:
+            if record["full"] and isinstance(crawler.commonWords, Counter):
+                crawler.commonWords.clear()
+
+            crawler.pagesCrawled = record["pages"]
+            restore_counter(crawler.domainCount, record["domainCount"])
+            restore_counter(crawler.subdirectoryCount, record["subdirectoryCount"])
+            crawler.subdomainCount.clear()
+            crawler.subdomainCount.update(record["subdomainCount"])
+            crawler.maxOutLinks = record["maxOutLinks"]
+            crawler.longestPage = record["longestPage"]
+            crawler.truncatedPages = record.get("truncatedPages", {})
+
+            kind, words = record["commonWords"]
+            if kind == "space-saving":
+                common = crawler.commonWords
+                common.capacity, common.total, common.counts, common.errors = words
+                common.heap = [(c, w) for w, c in common.counts.items()]
+                common.heap.sort()
+            else:
+                crawler.commonWords.update(words)
+
+            if "downloadedURLS" in record and not isinstance(crawler.downloadedURLS, StreamingURLSet):
+                crawler.downloadedURLS.update(record["downloadedURLS"])
+                crawler.traps.update(record["traps"])
+
+        self.records = len(records)
+        if len(records) > 0:
+            logger.info("Resumed from %s after %s pages", self.path, crawler.pagesCrawled)
+        return len(records) > 0
@@ -0,0 +1,175 @@
+import math
+import sys
+from array import array
+from hashlib import blake2b
+
+
+class ExactCounter:
+    """
+    Exact counts, partitioned by host. Each host string is interned once and only the rest of the key is stored per
+    entry, so trap counters keyed by netloc + path no longer keep a full url-sized string for every page.
+    """
+    name = "exact"
+
+    def __init__(self):
+        self.partitions = {}  # {interned host: {key: count}}
+        self.total = 0
+        self.changed = None  # {(host, key)} changed since the last checkpoint, once track_changes() is called
+
+    def add(self, key, partition=""):
+        """
+        Count one more occurrence of key and return its count.
+        """
+        counts = self.partitions.get(partition)
+        if counts is None:
+            counts = self.partitions[sys.intern(partition)] = {}
+        count = counts.get(key, 0) + 1
+        counts[key] = count
+        self.total += 1
+        if self.changed is not None:
+            self.changed.add((partition, key))
+        return count
+
+    def set(self, key, partition, count):
+        counts = self.partitions.get(partition)
+        if counts is None:
+            counts = self.partitions[sys.intern(partition)] = {}
+        counts[key] = count
+
+    def track_changes(self):
+        self.changed = set()
+
+    def pop_changes(self):
+        """
+        Return [(host, key, count)] for the keys changed since the last call, and start over.
+        """
+        changes = [(partition, key, self.partitions[partition][key]) for partition, key in self.changed]
+        self.changed = set()
+        return changes
+
+    def get(self, key, partition=""):
+        counts = self.partitions.get(partition)
+        return counts.get(key, 0) if counts is not None else 0
+
+    def items(self):
+        for partition, counts in self.partitions.items():
+            for key, count in counts.items():
+                yield (partition, key), count
+
+    def __len__(self):
+        return sum(len(counts) for counts in self.partitions.values())
+
+    def memory_bytes(self):
+        size = sys.getsizeof(self.partitions)
+        for partition, counts in self.partitions.items():
+            size += sys.getsizeof(partition) + sys.getsizeof(counts)
+            for key, count in counts.items():
+                size += sys.getsizeof(key) + (sys.getsizeof(count) if count > 256 else 0)
+        return size
+
+    def report(self):
+        return {"backend": self.name, "keys": len(self), "total": self.total, "memory_bytes": self.memory_bytes(),
+                "false_trap_rate": 0.0}
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch with conservative update. Memory is fixed at width * depth counters whatever the number of keys.
+    Counts are never under-estimated. With width = ceil(e / epsilon) and depth = ceil(ln(1 / delta)), a count is
+    over-estimated by more than epsilon * total with probability at most delta, so a url is wrongly called a trap only
+    when its true count is within that margin below the threshold.
+    """
+    name = "count-min"
+
+    def __init__(self, width=2 ** 16, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('I', bytes(4 * width)) for _ in range(depth)]
+        self.total = 0
+
+    @classmethod
+    def from_error(cls, epsilon=0.0001, delta=0.01):
+        return cls(int(math.ceil(math.e / epsilon)), int(math.ceil(math.log(1 / delta))))
+
+    @classmethod
+    def build(cls, width=None, depth=None, epsilon=0.0001, delta=0.01):
+        """
+        A sketch sized by width and depth where they are given, and by the error bound (see from_error) otherwise.
+        """
+        if width is None:
+            width = int(math.ceil(math.e / epsilon))
+        if depth is None:
+            depth = int(math.ceil(math.log(1 / delta)))
+        return cls(width, depth)
+
+    def _indexes(self, key, partition):
+        digest = blake2b((partition + "\0" + key).encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        width = self.width
+        return [(h1 + i * h2) % width for i in range(self.depth)]
+
+    def add(self, key, partition=""):
+        """
+        Count one more occurrence of key and return its estimated count.
+        """
+        indexes = self._indexes(key, partition)
+        rows = self.rows
+        count = min(rows[i][j] for i, j in enumerate(indexes)) + 1
+        # conservative update: only raise the counters that are below the new estimate
+        for i, j in enumerate(indexes):
+            if rows[i][j] < count:
+                rows[i][j] = count
+        self.total += 1
+        return count
+
+    def get(self, key, partition=""):
+        indexes = self._indexes(key, partition)
+        return min(self.rows[i][j] for i, j in enumerate(indexes))
+
+    def error_bound(self):
+        """
+        (epsilon * total, delta): estimates exceed the true count by more than the first value with probability at
+        most the second.
+        """
+        return math.e / self.width * self.total, math.exp(-self.depth)
+
+    def memory_bytes(self):
+        return sys.getsizeof(self.rows) + sum(sys.getsizeof(row) for row in self.rows)
+
+    def report(self):
+        overcount, delta = self.error_bound()
+        return {"backend": self.name, "width": self.width, "depth": self.depth, "total": self.total,
+                "memory_bytes": self.memory_bytes(), "max_overcount": overcount, "delta": delta}
+
+
+def false_trap_rate(keys, counter, max_count):
+    """
+    Replay (key, partition) pairs through counter and an exact counter side by side, and return the fraction of the
+    keys counter would reject (count over max_count) that the exact counts would have let through.
+    """
+    exact = ExactCounter()
+    rejected = 0
+    false_traps = 0
+    for key, partition in keys:
+        if counter.add(key, partition) > max_count:
+            rejected += 1
+            if exact.add(key, partition) <= max_count:
+                false_traps += 1
+        else:
+            exact.add(key, partition)
+    return false_traps / rejected if rejected > 0 else 0.0
+
+
+COUNTER_BACKENDS = {
+    ExactCounter.name: ExactCounter,
+    CountMinSketch.name: CountMinSketch.build,
+}
+
+
+def make_counter(backend="exact", **options):
+    """
+    Build a trap counter by backend name ("exact" or "count-min"); options go to the backend. A count-min sketch takes
+    width / depth, or epsilon / delta for whichever of the two is left out.
+    """
+    return COUNTER_BACKENDS[backend](**options)
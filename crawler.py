@@ -1,30 +1,67 @@
 import logging
-from urllib.parse import urlparse, urljoin, parse_qs
-from bs4 import BeautifulSoup
-from collections import defaultdict
-import re
+import os
+import sys
+import time
+from collections import defaultdict, deque, Counter
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from link_extractor import EXTRACTOR_VERSION
+from tokenizer import STOP_WORDS, DEFAULT_TOKENIZER
+from analytics_sink import StreamingURLSet
+from bloom import ScalableBloomFilter
+from checkpoint import Checkpointer
+from counters import make_counter
+from dedup import EXACT_DUPLICATE, ContentDedup
+from instrumentation import CrawlStats, NullStats
+from link_graph import REJECTED, LinkGraph
+from parse_cache import ParseCache
+from parsers import PARSERS, ParseError, ParserSelector
+from redirect_cache import RedirectCache
+from url_cache import URLCache
+from url_filter import UrlFilter
+from urlstore import URLStore
+from word_counting import WordCounter
 
 logger = logging.getLogger(__name__)
 
-STOP_WORDS = ['i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've", "you'll", "you'd",
-              'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', "she's",
-              'her', 'hers', 'herself', 'it', "it's", 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves',
-              'what', 'which', 'who', 'whom', 'this', 'that', "that'll", 'these', 'those', 'am', 'is', 'are', 'was',
-              'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing', 'a', 'an',
-              'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for', 'with',
-              'about',
-              'against', 'between', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from',
-              'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here',
-              'there',
-              'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some',
-              'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will',
-              'just',
-              'don', "don't", 'should', "should've", 'now', 'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren',
-              "aren't", 'couldn', "couldn't", 'didn', "didn't", 'doesn', "doesn't", 'hadn', "hadn't", 'hasn', "hasn't",
-              'haven',
-              "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn', "mustn't", 'needn', "needn't", 'shan',
-              "shan't", 'shouldn', "shouldn't", 'wasn', "wasn't", 'weren', "weren't", 'won', "won't", 'wouldn',
-              "wouldn't"]
+
+def extract_document(url_data, max_bytes=None, max_seconds=None, parser="lxml"):
+    """
+    Pull the absolute out-links and the text out of a fetched page with one of the parsers.PARSERS backends. The
+    default, lxml, gets links and text out of a single streaming pass; BeautifulSoup is only used when the backend
+    rejects the document. With a byte or time budget the page is fed to lxml in chunks and parsing stops once the
+    budget is spent. Returns (links, text, why the page was cut short or None).
+    """
+    if url_data["content"] is None or url_data["http_code"] == 404:
+        return [], "", None
+
+    try:
+        return PARSERS[parser].parse(url_data["content"], url_data["url"], max_bytes, max_seconds)
+    except ParseError:
+        logger.info("Falling back to BeautifulSoup for malformed page %s", url_data["url"])
+        return PARSERS["bs4"].parse(url_data["content"], url_data["url"], max_bytes)
+
+
+def parse_document(url_data, tokenizer=DEFAULT_TOKENIZER, max_bytes=None, max_seconds=None, parser="lxml"):
+    """
+    Parse a fetched page into its absolute out-links, its token words (none without a tokenizer) and why it was cut
+    short, if it was. Kept at module level so the pipelined crawl can run it in a worker process; it does not touch
+    any Crawler state.
+    """
+    outputLinks, text, truncated = extract_document(url_data, max_bytes, max_seconds, parser)
+    return outputLinks, tokenizer.tokens(text) if tokenizer is not None else [], truncated
+
+
+def add_new_urls(urls, url_set):
+    """
+    Add urls to a set (or StreamingURLSet) and return the ones it did not hold yet, in order.
+    """
+    new_urls = []
+    for url in urls:
+        if url not in url_set:
+            url_set.add(url)
+            new_urls.append(url)
+    return new_urls
 
 
 class Crawler:
@@ -33,122 +70,550 @@ class Crawler:
     the frontier
     """
 
-    def __init__(self, frontier, corpus):
+    def __init__(self, frontier, corpus, fetch_workers=1, parse_workers=0, pages_in_flight=None, tokenizer=None,
+                 trap_counter="exact", trap_counter_options=None, analytics_dir=None, common_words=None, top_words=50,
+                 checkpoint_dir=None, checkpoint_every=1000, resume=False, dedup=False, batch_admission=False,
+                 seen_capacity=1000000, instrument=False, summary_every=60.0, profile_every=0, word_policy=None,
+                 lazy_words=False, parse_max_bytes=None, parse_max_seconds=None, trap_templates=None,
+                 compact_urls=False, parse_cache=None, link_graph=False, graph_dir=None, parser=None,
+                 subdirectories_by_host=False):
         self.frontier = frontier
         self.corpus = corpus
-        self.domainCount = defaultdict(int)
-        self.subdirectoryCount = defaultdict(int)
+        self.tokenizer = tokenizer or DEFAULT_TOKENIZER
+
+        # per-stage timers, rates and sampled profiles of the crawl loop
+        self.stats = CrawlStats(summary_every, profile_every) if instrument else NullStats()
+
+        # pipelined mode: threads read from the corpus, processes parse; serial when both are left at the default
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.pagesInFlight = pages_in_flight or 2 * (fetch_workers + parse_workers)
 
-        # analytics 1: subdomains
+        self.urlCache = URLCache()  # parsed urls, shared by is_valid and subdomains
+
+        # trap heuristics: "exact" counts, or a fixed-size "count-min" sketch for very large crawls
+        self.domainCount = make_counter(trap_counter, **(trap_counter_options or {}))
+        self.subdirectoryCount = make_counter(trap_counter, **(trap_counter_options or {}))
+        # trap_templates: a traps.TemplateTrapRule to also reject url templates that keep generating new urls;
+        # subdirectories_by_host: count repeating subdirectories per host rather than by path alone
+        self.urlFilter = UrlFilter.default(self.domainCount, self.subdirectoryCount, self.urlCache, trap_templates,
+                                           subdirectories_by_host)
+
+        # analytics 1: subdomains, counted as urls are first downloaded
         self.subdomainCount = defaultdict(int)
+        self.hostSubdomains = {}  # {interned host: its subdomain labels}
 
         # analytic 2: valid outlinks
         self.maxOutLinks = ["", 0]  # URL, number of out-links
 
+        # the link graph of admitted and rejected links, kept in memory with link_graph and also streamed to graph_dir
+        # if given. It only holds the pages crawled since this process started, so analytic 2 is still kept as pages
+        # are processed (and checkpointed with the rest)
+        self.linkGraph = LinkGraph(graph_dir) if link_graph or graph_dir is not None else None
+
+        # batched frontier admission: links already resolved are recognised by two Bloom filters, one for links found
+        # in the corpus and one for links that are not, so only never-seen links are looked up. The filters start at
+        # seen_capacity links and grow past it. Hashing a link costs about as much as an in-memory corpus lookup, so
+        # this runs at 0.75-0.9x the speed of per-link admission there; it pays off when get_file_name is slow (disk
+        # or network)
+        self.batchAdmission = batch_admission
+        if batch_admission:
+            self.admittedLinks = ScalableBloomFilter(seen_capacity)
+            self.missingLinks = ScalableBloomFilter(seen_capacity)
+
+        # per-page parse budgets: past them link extraction stops early and the page is listed as truncated
+        self.parseMaxBytes = parse_max_bytes
+        self.parseMaxSeconds = parse_max_seconds
+        self.truncatedPages = {}  # {url: "byte budget" or "time budget"}
+
+        # parser backend: a parsers.PARSERS name for every page, or "auto" / a parsers.ParserSelector to pick one per
+        # page from its size, content and measured speed and recall; lxml when left unset
+        self.parser = "lxml"
+        self.parserSelector = None
+        if parser == "auto":
+            self.parserSelector = ParserSelector()
+        elif isinstance(parser, ParserSelector):
+            self.parserSelector = parser
+        elif parser is not None:
+            self.parser = parser
+
+        # parse results of unchanged pages kept on disk across runs, in an SQLite file at the parse_cache path
+        self.parseCache = None
+        if parse_cache is not None:
+            version = "{}:{}".format(EXTRACTOR_VERSION, self.tokenizer.fingerprint())
+            if parser is not None:
+                version += ":" + ("auto" if self.parserSelector is not None else self.parser)
+            self.parseCache = ParseCache(parse_cache, version)
+
+        # redirect targets are read and parsed once, however many urls redirect to them
+        self.redirectCache = RedirectCache()
+
+        # pages whose content was already seen under another url are not parsed again
+        self.dedup = ContentDedup() if dedup else None
+        self.trapReasons = defaultdict(int)  # {reason: pages skipped}
+
         # analytic 3: downloaded urls and identified traps
-        self.downloadedURLS = set()
-        self.traps = set()
+        # with an analytics_dir they are streamed to files there as they are found instead of kept in memory;
+        # compact_urls keeps them in memory in a urlstore.URLStore instead of a set
+        self.analyticsDir = analytics_dir
+        if analytics_dir is not None:
+            self.downloadedURLS = StreamingURLSet(os.path.join(analytics_dir, "downloaded_urls.txt"), resume=resume)
+            self.traps = StreamingURLSet(os.path.join(analytics_dir, "trap_urls.txt"), resume=resume)
+        elif compact_urls:
+            self.downloadedURLS = URLStore()
+            self.traps = URLStore()
+        else:
+            self.downloadedURLS = set()
+            self.traps = set()
 
         # analytic 4: longest page
         self.longestPage = ["", 0]  # URL, number of words
 
         # analytic 5: 50 most common words
-        self.commonWords = defaultdict(int)  # {(word: count),...}
+        # exact Counter by default; pass a topk.SpaceSaving to keep memory bounded on very large crawls
+        self.commonWords = common_words if common_words is not None else Counter()  # {(word: count),...}
+        self.topWords = top_words
+        # word_counting.WordPolicy to skip or sample pages; lazy_words counts them on a background thread (serial mode)
+        self.wordPolicy = word_policy
+        self.wordCounter = WordCounter(self) if lazy_words else None
+
+        # periodic checkpoints of all of the above, and resuming from them
+        self.pagesCrawled = 0
+        self.checkpointer = None
+        self.checkpointDue = False  # written once no page taken off the frontier is still in flight
+        if checkpoint_dir is not None:
+            self.checkpointer = Checkpointer(checkpoint_dir, checkpoint_every)
+            self.checkpointer.start(self)
+            if resume:
+                self.checkpointer.restore(self)
+        if resume and analytics_dir is not None:
+            # urls streamed after the last checkpoint are already in the file, so count them from it once
+            self.subdomains()
+
+    @classmethod
+    def resume(cls, frontier, corpus, checkpoint_dir, **options):
+        """
+        Build a crawler that picks up from the last checkpoint in checkpoint_dir. The frontier is expected to restore
+        its own queue.
+        """
+        return cls(frontier, corpus, checkpoint_dir=checkpoint_dir, resume=True, **options)
 
     # ------ ANALYTICS 4 & 5 ------
     def count_words(self, content, url):
         """
         Count words from content of valid pages to find the 50 most common words.
         """
-        count = 0
+        self.record_words(self.tokenizer.tokens(content.get_text()), url)
 
-        # divide text into token words and check against stopword
-        temp = ""
-        for c in content.get_text():
-            if c.isalnum() and c.isascii():
-                temp += c
-            else:
-                if len(temp) > 1 and temp.isdigit() == False:
-                    temp = temp.lower()
-                    if temp not in STOP_WORDS:
-                        count += 1
-                        self.commonWords[temp] += 1
-                temp = ""
+    def record_words(self, words, url):
+        """
+        Add the token words of one page (a list, or a Counter of them) to the common word counts and the longest page.
+        """
+        self.commonWords.update(words)
+        if self.checkpointer is not None:
+            self.checkpointer.note_words(words)
 
+        count = sum(words.values()) if isinstance(words, Counter) else len(words)
         if count > self.longestPage[1]:
             self.longestPage = [url, count]
 
     # ------ ANALYTICS 1 ------
+    def count_subdomains(self, urls):
+        """
+        Add newly downloaded urls to the subdomain counts, through a table of hosts already split into labels.
+        """
+        for url in urls:
+            host = self.urlCache.parse(url).netloc
+            labels = self.hostSubdomains.get(host)
+            if labels is None:
+                subdomain = host.split('.')
+                labels = [subdomain[i] for i in range(len(subdomain) - 2) if subdomain[i] != "www"]
+                self.hostSubdomains[sys.intern(host)] = labels
+            for label in labels:
+                self.subdomainCount[label] += 1
+
     def subdomains(self):
-        for url in self.downloadedURLS:
-            parsed = urlparse(url)
-            subdomain = parsed.netloc.split('.')
-            for i in range(len(subdomain) - 2):
-                if subdomain[i] != "www":
-                    self.subdomainCount[subdomain[i]] += 1
-
-    def analytics(self):
-        analytic_file = open("analytics.txt", 'w')
-
-        # analytic 1
-        analytic_file.write('Subdomain and Counts: \n')
-        for k, v in self.subdomainCount.items():
-            analytic_file.write('{}: {}\n'.format(k, v))
-
-        # analytic 2
-        analytic_file.write('\nPage w/Most Valid Outlinks: {}\n'.format(self.maxOutLinks[0]))
-
-        # analytic 3
-        analytic_file.write("\nDownloaded URLS: \n")
-        for url in self.downloadedURLS:
-            analytic_file.write(url + '\n')
-
-        analytic_file.write("\nTrap URLS: \n")
-        for trap_url in self.traps:
-            analytic_file.write(trap_url + '\n')
-
-        # analytic 4
-        analytic_file.write("\nURL with Longest Page: \n")
-        analytic_file.write(self.longestPage[0])
-        analytic_file.write("\n")
-
-        # analytic 5
-        sorted_words = sorted(self.commonWords.items(), key=lambda item: item[1], reverse=True)[:50]
-        analytic_file.write("\n50 Most Common Words: \n")
-        for w, c in sorted_words:
-            analytic_file.write(str(w) + '\n')
+        """
+        Recount the subdomains from scratch over every downloaded url. The counts are kept up to date during the crawl,
+        so this is only needed when downloadedURLS was filled some other way.
+        """
+        self.subdomainCount = defaultdict(int)
+        self.count_subdomains(self.downloadedURLS)
+
+    def analytics(self, path=None):
+        """
+        Write the analytics report. Can be called at any point of the crawl; streamed url files are
+        read back from disk.
+        """
+        if path is None:
+            path = os.path.join(self.analyticsDir or "", "analytics.txt")
+        if self.wordCounter is not None:
+            self.wordCounter.wait()
+
+        with open(path, 'w') as analytic_file:
+            # analytic 1
+            analytic_file.write('Subdomain and Counts: \n')
+            for k, v in self.subdomainCount.items():
+                analytic_file.write('{}: {}\n'.format(k, v))
+
+            # analytic 2
+            analytic_file.write('\nPage w/Most Valid Outlinks: {}\n'.format(self.maxOutLinks[0]))
+
+            # analytic 3
+            analytic_file.write("\nDownloaded URLS: \n")
+            for url in self.downloadedURLS:
+                analytic_file.write(url + '\n')
+
+            analytic_file.write("\nTrap URLS: \n")
+            for trap_url in self.traps:
+                analytic_file.write(trap_url + '\n')
+
+            # analytic 4
+            analytic_file.write("\nURL with Longest Page: \n")
+            analytic_file.write(self.longestPage[0])
+            analytic_file.write("\n")
+
+            # analytic 5
+            sorted_words = self.commonWords.most_common(self.topWords)
+            analytic_file.write("\n{} Most Common Words: \n".format(self.topWords))
+            for w, c in sorted_words:
+                analytic_file.write(str(w) + '\n')
+
+            if self.parseMaxBytes is not None or self.parseMaxSeconds is not None:
+                analytic_file.write("\nTruncated Pages (parse budget spent): \n")
+                for url, reason in self.truncatedPages.items():
+                    analytic_file.write('{} ({})\n'.format(url, reason))
+
+            redirects = self.redirectCache.report()
+            analytic_file.write("\nRedirect Cache: {} redirects, {} hits, {} misses, hit rate {:.1%}\n".format(
+                redirects["redirects"], redirects["hits"], redirects["misses"], redirects["hit_rate"]))
 
     def start_crawling(self):
         """
         This method starts the crawling process which is scraping urls from the next available link in frontier and adding
         the scraped links to the frontier
         """
-        while self.frontier.has_next_url():
-            url = self.frontier.get_next_url()
-            logger.info("Fetching URL %s ... Fetched: %s, Queue size: %s", url, self.frontier.fetched,
-                        len(self.frontier))
+        try:
+            if self.fetch_workers > 1 or self.parse_workers > 0:
+                self.crawl_pipelined()
+            else:
+                while self.frontier.has_next_url():
+                    self.crawl_page(self.frontier.get_next_url())
+        finally:
+            # keep what was found so far on disk, even if the crawl died
+            if self.analyticsDir is not None:
+                self.downloadedURLS.flush()
+                self.traps.flush()
+
+        self.finish_crawl()
+
+    def finish_crawl(self):
+        """
+        Wrap up a finished crawl: final checkpoint, analytics report, closing the url streams and logging the stats.
+        """
+        if self.wordCounter is not None:
+            self.wordCounter.close()
+        if self.parseCache is not None:
+            logger.info("Parse cache: %s", self.parseCache.report())
+            self.parseCache.close()
+        if self.parserSelector is not None:
+            logger.info("Parser backends: %s", self.parserSelector.report())
+        if self.linkGraph is not None:
+            self.linkGraph.close()
+            logger.info("Link graph: %s urls, %s edges, top out-degree %s", len(self.linkGraph.urls),
+                        len(self.linkGraph), self.linkGraph.top_out_degree(5))
+        if self.checkpointer is not None:
+            self.checkpointer.save(self, full=True)
+        self.analytics()
+        if self.analyticsDir is not None:
+            self.downloadedURLS.close()
+            self.traps.close()
+        logger.info("Trap counters: domain %s, subdirectory %s", self.domainCount.report(),
+                    self.subdirectoryCount.report())
+        if isinstance(self.stats, CrawlStats):
+            self.stats.log_summary()
+        if self.dedup is not None:
+            logger.info("Dedup: %s, trap reasons: %s", self.dedup.report(), dict(self.trapReasons))
+
+    def crawl_page(self, url):
+        """
+        Fetch and parse one url taken off the frontier, and process its out-links.
+        """
+        logger.info("Fetching URL %s ... Fetched: %s, Queue size: %s", url, self.frontier.fetched, len(self.frontier))
+        self.stats.begin_page()
+        with self.stats.stage("fetch_url"):
             url_data = self.corpus.fetch_url(url)
 
-            count = 0
-            for next_link in self.extract_next_links(url_data):
-                if self.is_valid(next_link):
-                    # ------ ANALYTICS 3 ------
-                    self.downloadedURLS.add(next_link)
-                    # ------ ANALYTICS 3 ------
+        links = self.process_page(url, url_data)
+        self.stats.end_page(len(links))
+        if self.checkpointDue:
+            self.save_checkpoint()
+
+    def process_page(self, url, url_data):
+        """
+        Parse a page fetched for url and process its out-links, which are returned.
+        """
+        links = self.extract_next_links(url_data)
+        self.process_links(url, links)
+        return links
 
-                    if self.corpus.get_file_name(next_link) is not None:
-                        self.frontier.add_url(next_link)
-                        count += 1
+    def process_links(self, url, links):
+        """
+        Validate the out-links of a crawled page, add the valid ones to the frontier and update analytics 2 and 3.
+        Returns how many links were admitted to the frontier.
+        """
+        count = self.check_links(url, links)
+
+        # ------ ANALYTICS 2 ------
+        if count > self.maxOutLinks[1]:
+            self.maxOutLinks = [url, count]
+        # ------ ANALYTICS 2 ------
+
+        self.pagesCrawled += 1
+        if self.checkpointer is not None and self.pagesCrawled % self.checkpointer.every == 0:
+            self.checkpointDue = True
+        return count
+
+    def check_links(self, url, links):
+        """
+        Run links found on page url through is_valid, record them for analytics 1 and 3 and the link graph, and add
+        the ones in the corpus to the frontier. Returns how many were added.
+        """
+        with self.stats.stage("is_valid"):
+            valid, traps = self.urlFilter.filter_links(links, url)
+        # ------ ANALYTICS 3 ------
+        new_downloaded = add_new_urls(valid, self.downloadedURLS)
+        new_traps = add_new_urls(traps, self.traps)
+        # ------ ANALYTICS 3 ------
+
+        # ------ ANALYTICS 1 ------
+        self.count_subdomains(new_downloaded)
+        # ------ ANALYTICS 1 ------
+
+        if self.checkpointer is not None:
+            self.checkpointer.note_urls(self, new_downloaded, new_traps)
+
+        with self.stats.stage("frontier"):
+            if self.batchAdmission:
+                admitted = self.admit_links_batched(valid)
+            else:
+                admitted = self.admit_links(valid)
+        if self.linkGraph is not None:
+            self.linkGraph.add_edges(url, admitted)
+            self.linkGraph.add_edges(url, traps, REJECTED)
+        return len(admitted)
+
+    def save_checkpoint(self):
+        """
+        Write the checkpoint that is due. The crawl loops only call this with no page in flight: the frontier is saved
+        along with it, and a url already taken off the frontier but not yet processed would be lost on resume.
+        """
+        if self.wordCounter is not None:
+            self.wordCounter.wait()
+        self.checkpointer.save(self)
+        self.checkpointDue = False
+
+    def admit_links(self, links):
+        """
+        Add the links that are in the corpus to the frontier, one at a time. Returns the links that were in the corpus,
+        repeats included.
+        """
+        admitted = []
+        for next_link in links:
+            if self.corpus.get_file_name(next_link) is not None:
+                self.frontier.add_url(next_link)
+                admitted.append(next_link)
+        return admitted
+
+    def admit_links_batched(self, links):
+        """
+        Same result as admit_links, in bulk: the page's links are deduped locally, links seen on earlier pages are
+        answered by the Bloom filters, and the rest are resolved and handed to the frontier in one call each (when the
+        corpus and frontier offer get_file_names / add_urls). A Bloom false positive (under two in a million links,
+        however many are seen) would leave a never-seen link out of the frontier.
+        """
+        found = {}  # {link: in the corpus}
+        unresolved = []
+        for next_link in dict.fromkeys(links):
+            if next_link in self.admittedLinks:
+                found[next_link] = True
+            elif next_link in self.missingLinks:
+                found[next_link] = False
+            else:
+                unresolved.append(next_link)
+
+        if hasattr(self.corpus, "get_file_names"):
+            file_names = self.corpus.get_file_names(unresolved)
+        else:
+            file_names = [self.corpus.get_file_name(next_link) for next_link in unresolved]
+
+        new_links = []
+        for next_link, file_name in zip(unresolved, file_names):
+            found[next_link] = file_name is not None
+            if file_name is not None:
+                self.admittedLinks.add(next_link)
+                new_links.append(next_link)
+            else:
+                self.missingLinks.add(next_link)
+
+        if hasattr(self.frontier, "add_urls"):
+            self.frontier.add_urls(new_links)
+        else:
+            for next_link in new_links:
+                self.frontier.add_url(next_link)
+        return [next_link for next_link in links if found[next_link]]
+
+    def fetch_page(self, url):
+        """
+        Read a page from the corpus and, for a redirect, its final page, unless that one's parse result is already
+        cached. Returns (url_data, final url_data or None). Safe to run on a worker thread.
+        """
+        url_data = self.corpus.fetch_url(url)
+        if url_data["is_redirected"] is not True:
+            return url_data, url_data
+        if self.redirectCache.has(url_data["final_url"]):
+            return url_data, None
+        return url_data, self.corpus.fetch_url(url_data["final_url"])
+
+    def check_duplicate(self, url, url_data):
+        """
+        Check a fetched page against the dedup index and return why it is a duplicate, or None. An exact duplicate is
+        not parsed at all; a near duplicate is still parsed for its links, but its words are not counted. Either way
+        url, the one taken from the frontier, is recorded as a trap along with the reason. For a redirect that is the
+        alias rather than the page it leads to, which may well have been crawled directly.
+        """
+        if self.dedup is None or url_data["content"] is None or url_data["http_code"] == 404:
+            return None
+
+        reason = self.dedup.check(url_data["content"])
+        if reason is None:
+            return None
+        logger.info("Skipping %s: %s", url, reason)
+        new_traps = add_new_urls([url], self.traps)
+        if self.checkpointer is not None:
+            self.checkpointer.note_urls(self, [], new_traps)
+        self.trapReasons[reason] += 1
+        return reason
+
+    def submit_parse(self, parse_pool, pages):
+        """
+        Start parsing a page fetched by fetch_page and return a future for its (links, words). Cached redirect targets,
+        duplicates and pages parsed on this thread come back as already finished futures.
+        """
+        source_data, url_data = pages
+        if source_data["is_redirected"] is True:
+            self.redirectCache.add_redirect(source_data["url"], source_data["final_url"])
+            cached = self.redirectCache.get(source_data["final_url"])
+            if cached is not None:
+                future = Future()
+                future.set_result(cached + (None,))
+                return future
+            if url_data is None:
+                url_data = self.corpus.fetch_url(source_data["final_url"])
+
+        duplicate = self.check_duplicate(source_data["url"], url_data)
+        if duplicate == EXACT_DUPLICATE:
+            future = Future()
+            future.set_result(([], [], None))
+        else:
+            counted = duplicate is None and self.counts_words(url_data)
+            tokenizer = self.tokenizer if counted else None
+            key = self.parse_cache_key(url_data) if counted else None
+            cached = self.parseCache.get(key) if key is not None else None
+            if cached is not None:
+                future = Future()
+                future.set_result(cached + (None,))
+            else:
+                kind, parser = self.choose_parser(url_data)
+                if self.parserSelector is not None and url_data["content"] is not None and \
+                        url_data["http_code"] != 404:
+                    # parses in the pool are not timed, so the selector only learns from its samples here
+                    self.parserSelector.observe(kind, parser, url_data, None, self.parseMaxBytes,
+                                                self.parseMaxSeconds)
+                if parse_pool is not None:
+                    future = parse_pool.submit(parse_document, url_data, tokenizer, self.parseMaxBytes,
+                                               self.parseMaxSeconds, parser)
                 else:
-                    self.traps.add(next_link)
+                    future = Future()
+                    future.set_result(parse_document(url_data, tokenizer, self.parseMaxBytes, self.parseMaxSeconds,
+                                                     parser))
+            if key is not None and cached is None:
+                future.add_done_callback(lambda done: self.cache_parse(key, *done.result()))
+        return future
+
+    def parse_cache_key(self, url_data):
+        """
+        The parse cache key of a fetched page (its corpus file name and a hash of its content), or None when it is
+        not cached.
+        """
+        if self.parseCache is None or url_data["content"] is None or url_data["http_code"] == 404:
+            return None
+        file_name = self.corpus.get_file_name(url_data["url"]) or url_data["url"]
+        return self.parseCache.key(file_name, url_data["content"])
 
-            # ------ ANALYTICS 2 ------
-            if count > self.maxOutLinks[1]:
-                self.maxOutLinks = [url, count]
-            # ------ ANALYTICS 2 ------
+    def cache_parse(self, key, links, words, truncated=None):
+        # a page cut short by a parse budget is parsed again next time
+        if truncated is None:
+            self.parseCache.put(key, links, words)
 
-        self.subdomains()
-        self.analytics()
+    def crawl_pipelined(self):
+        """
+        Crawl with several pages in flight: corpus reads run on a thread pool and parsing on a process pool (or on this
+        thread when parse_workers is 0). Only this thread touches the frontier and the analytics, and finished pages are
+        handled in the order their urls left the frontier. With the FIFO frontier, urls taken ahead of time are ones the
+        serial loop would have taken next anyway, so the crawl discovers the same urls in the same order. Once a
+        checkpoint is due no more urls are taken until the pages in flight are done and it has been written.
+        """
+        pending = deque()  # [url, fetch future, parse future], oldest first
+        parse_pool = None
+        if self.parse_workers > 0:
+            from concurrent.futures import ProcessPoolExecutor  # pulls in multiprocessing, so only when it is used
+            parse_pool = ProcessPoolExecutor(self.parse_workers)
+
+        try:
+            with ThreadPoolExecutor(self.fetch_workers) as fetch_pool:
+                while True:
+                    while len(pending) < self.pagesInFlight and not self.checkpointDue and \
+                            self.frontier.has_next_url():
+                        url = self.frontier.get_next_url()
+                        logger.info("Fetching URL %s ... Fetched: %s, Queue size: %s", url, self.frontier.fetched,
+                                    len(self.frontier))
+                        pending.append([url, fetch_pool.submit(self.fetch_page, url), None])
+                    if len(pending) == 0:
+                        break
+
+                    # hand fetched pages to the parsers in order, without waiting on slower reads
+                    if parse_pool is not None:
+                        for page in pending:
+                            if page[2] is None:
+                                if not page[1].done():
+                                    break
+                                page[2] = self.submit_parse(parse_pool, page[1].result())
+
+                    url, fetch_future, parse_future = pending.popleft()
+                    self.stats.begin_page()
+                    with self.stats.stage("fetch_wait"):
+                        source_data = fetch_future.result()[0]
+                    if parse_future is None:
+                        parse_future = self.submit_parse(parse_pool, fetch_future.result())
+                    with self.stats.stage("parse_wait"):
+                        links, words, truncated = parse_future.result()
+
+                    page_url = source_data["url"]
+                    if source_data["is_redirected"] is True:
+                        page_url = source_data["final_url"]
+                        self.redirectCache.put(page_url, links, words)
+                    if truncated is not None:
+                        self.truncatedPages[page_url] = truncated
+                    if len(words) > 0:
+                        self.record_words(words, page_url)
+                    self.process_links(url, list(links))
+                    self.stats.end_page(len(links))
+                    if self.checkpointDue and len(pending) == 0:
+                        self.save_checkpoint()
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown()
 
     def extract_next_links(self, url_data):
         """
@@ -159,17 +624,91 @@ class Crawler:
         that have already been fetched. The frontier takes care of that.
         Suggested library: lxml
         """
-        outputLinks = []
-
-        if url_data["is_redirected"] is True:
-            url_data = self.corpus.fetch_url(url_data["final_url"])
-        if url_data["content"] is not None and url_data["http_code"] != 404:
-            content = BeautifulSoup(url_data["content"], features="lxml")
-            self.count_words(content, url_data["url"])
-            for a in content.find_all('a', href=True):
-                outputLinks.append(urljoin(url_data["url"], a['href']))
+        url = url_data["url"]
+        redirected = url_data["is_redirected"] is True
+        if redirected:
+            final_url = url_data["final_url"]
+            self.redirectCache.add_redirect(url, final_url)
+            cached = self.redirectCache.get(final_url)
+            if cached is not None:
+                outputLinks, words = cached
+                if self.wordCounter is not None:
+                    self.wordCounter.record(words, final_url)
+                elif len(words) > 0:
+                    self.record_words(words, final_url)
+                return list(outputLinks)
+            with self.stats.stage("fetch_url"):
+                url_data = self.corpus.fetch_url(final_url)
+        duplicate = self.check_duplicate(url, url_data)
+        if duplicate == EXACT_DUPLICATE:
+            return []
+
+        counted = duplicate is None and self.counts_words(url_data)
+        key = self.parse_cache_key(url_data) if counted else None
+        cached = self.parseCache.get(key) if key is not None else None
+        if cached is not None:
+            outputLinks, words = cached
+            if self.wordCounter is not None:
+                self.wordCounter.record(words, url_data["url"])
+            else:
+                self.record_words(words, url_data["url"])
+            if redirected:
+                self.redirectCache.put(final_url, outputLinks, words)
+            return list(outputLinks)
+
+        kind, parser = self.choose_parser(url_data)
+        parse_started = time.perf_counter()
+        with self.stats.stage("parse"):
+            outputLinks, text, truncated = extract_document(url_data, self.parseMaxBytes, self.parseMaxSeconds, parser)
+        parse_seconds = time.perf_counter() - parse_started
+        if truncated is not None:
+            logger.info("Stopped parsing %s at its %s (%s bytes)", url_data["url"], truncated,
+                        len(url_data["content"]))
+            self.truncatedPages[url_data["url"]] = truncated
+        self.stats.record_parse(len(url_data["content"] or b""), parse_seconds)
+        if self.parserSelector is not None and url_data["content"] is not None and url_data["http_code"] != 404:
+            self.parserSelector.observe(kind, parser, url_data, parse_seconds, self.parseMaxBytes,
+                                        self.parseMaxSeconds)
+
+        if not counted:
+            text = ""
+        if self.wordCounter is not None:
+            # counted in the background; a redirect target's Counter is filled in before anything reads it
+            words = Counter()
+            if len(text) > 0:
+                done = None
+                if key is not None:
+                    done = lambda page_words: self.cache_parse(key, outputLinks, page_words, truncated)
+                self.wordCounter.submit(text, url_data["url"], words if redirected else None, done)
+            elif key is not None:
+                self.cache_parse(key, outputLinks, words, truncated)
+        else:
+            with self.stats.stage("count_words"):
+                words = self.tokenizer.tokens(text)
+            if url_data["content"] is not None and url_data["http_code"] != 404:
+                self.record_words(words, url_data["url"])
+            if key is not None:
+                self.cache_parse(key, outputLinks, words, truncated)
+        if redirected:
+            self.redirectCache.put(final_url, outputLinks, words)
+
+        return list(outputLinks)
+
+    def choose_parser(self, url_data):
+        """
+        The (document kind or None, parser backend name) to parse a fetched page with.
+        """
+        if self.parserSelector is None:
+            return None, self.parser
+        return self.parserSelector.choose(url_data)
 
-        return outputLinks
+    def counts_words(self, url_data):
+        """
+        Whether the words of a fetched page go into analytics 4 and 5 under the word policy.
+        """
+        if self.wordPolicy is None or url_data["content"] is None or url_data["http_code"] == 404:
+            return True
+        return self.wordPolicy.reason_to_skip(url_data) is None
 
     def is_valid(self, url):
         """
@@ -177,51 +716,4 @@ class Crawler:
         filter out crawler traps. Duplicated urls will be taken care of by frontier. You don't need to check for duplication
         in this method
         """
-        parsed = urlparse(url)
-
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-        try:
-            # Very long URL
-            if len(url) > 100:
-                return False
-
-            # Visiting pages from same link/domain
-            domainName = parsed.netloc + parsed.path
-            self.domainCount[domainName] += 1
-            if self.domainCount[domainName] > 10:
-                return False
-
-            # Check continuously repeating subdirectories
-            last_path_index = parsed.path.rfind('/')
-            new_path = parsed.path[:last_path_index]
-            if last_path_index == len(parsed.path):
-                new_index = new_path.rfind('/')
-                new_path = new_path[:new_index]
-            self.subdirectoryCount[new_path] += 1
-            if self.subdirectoryCount[new_path] > 50:
-                return False
-
-            query = parsed.query
-            if len(query) > 0:
-                # Many query params or very long query
-                query_count = parse_qs(query)
-                if (len(query_count.values()) > 3):
-                    return False
-
-                # Query value too long
-                for v in query_count.values():
-                    if (len(v[0]) > 25):
-                        return False
-
-
-            return ".ics.uci.edu" in parsed.hostname \
-                   and not re.match(".*\.(css|js|bmp|gif|jpe?g|ico" + "|png|tiff?|mid|mp2|mp3|mp4" \
-                                    + "|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf" \
-                                    + "|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso|epub|dll|cnf|tgz|sha1" \
-                                    + "|thmx|mso|arff|rtf|jar|csv" \
-                                    + "|rm|smil|wmv|swf|wma|zip|rar|gz|pdf)$", parsed.path.lower())
-
-        except TypeError:
-            print("TypeError for ", parsed)
-            return False
\ No newline at end of file
+        return self.urlFilter.is_valid(url)
\ No newline at end of file
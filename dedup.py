@@ -0,0 +1,124 @@
+import re
+from array import array
+from collections import Counter
+from hashlib import blake2b
+
+MASK_64 = (1 << 64) - 1
+WORD_PATTERN = re.compile(rb"[A-Za-z0-9]+")
+# markup left out of the fingerprint: comments, scripts, styles and links (navigation is mostly links, and the same
+# on every page of a site), then any other tag
+SKIPPED_PATTERN = re.compile(rb"<!--.*?-->|<(script|style|template|a)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(rb"<[^>]*>")
+
+EXACT_DUPLICATE = "duplicate content"
+NEAR_DUPLICATE = "near-duplicate content"
+
+
+def simhash(features):
+    """
+    64-bit SimHash of an iterable of integer feature hashes. Bits are tallied a byte position at a time with a Counter,
+    so the cost per page is fixed after hashing the features.
+    """
+    hashes = array('Q', [h & MASK_64 for h in features])
+    if len(hashes) == 0:
+        return 0
+
+    packed = hashes.tobytes()
+    half = len(hashes) / 2
+    value = 0
+    for position in range(8):
+        counts = Counter(packed[position::8]).items()
+        for bit in range(8):
+            ones = sum(count for byte, count in counts if byte >> bit & 1)
+            if ones > half:
+                value |= 1 << (position * 8 + bit)
+    return value
+
+
+def page_words(content):
+    """
+    The lowercase words of a page's text outside links, cut out of the raw bytes with regular expressions rather than
+    a parser.
+    """
+    return WORD_PATTERN.findall(TAG_PATTERN.sub(b" ", SKIPPED_PATTERN.sub(b" ", content)).lower())
+
+
+def content_simhash(content, shingle_size=3):
+    """
+    SimHash of a page from the distinct word shingles of its text (see page_words). Tags and attributes are left out
+    and each shingle counts once, so markup and repeated boilerplate do not outweigh what the page says. None for a
+    page with fewer than shingle_size words (a page of nothing but links): it has no text to compare.
+    """
+    words = page_words(content)
+    if len(words) < shingle_size:
+        return None
+    return simhash(set(hash(tuple(words[i:i + shingle_size])) for i in range(len(words) - shingle_size + 1)))
+
+
+class SimHashIndex:
+    """
+    Finds a stored SimHash within max_distance bits of a query. The 64 bits are cut into bands (more bands than
+    max_distance), so any near match agrees exactly on at least one band and only those candidates are compared.
+    """
+
+    def __init__(self, max_distance=3, bands=4):
+        self.maxDistance = max_distance
+        self.bandBits = 64 // bands
+        self.bandMask = (1 << self.bandBits) - 1
+        self.tables = [{} for _ in range(bands)]  # one {band value: [simhashes]} per band
+
+    def find(self, value):
+        for i, table in enumerate(self.tables):
+            for candidate in table.get(value >> (i * self.bandBits) & self.bandMask, ()):
+                if bin(candidate ^ value).count("1") <= self.maxDistance:
+                    return candidate
+        return None
+
+    def add(self, value):
+        for i, table in enumerate(self.tables):
+            table.setdefault(value >> (i * self.bandBits) & self.bandMask, []).append(value)
+
+
+class ContentDedup:
+    """
+    Dedup stage that runs before a page is parsed: an exact hash of the content, then a SimHash near-duplicate lookup
+    on its text. A page that hits either one has been seen under another url (calendar views, query-string
+    permutations). An exact duplicate does not need parsing or word counting again; a near duplicate is still parsed
+    for its links, which can differ, but its words are not counted again.
+    """
+
+    def __init__(self, near_duplicates=True, max_distance=3):
+        self.exactHashes = set()
+        self.index = SimHashIndex(max_distance) if near_duplicates else None
+        self.checked = 0
+        self.exactHits = 0
+        self.nearHits = 0
+
+    def check(self, content):
+        """
+        Return None for new content (and remember it), otherwise the reason it is a duplicate.
+        """
+        self.checked += 1
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        digest = blake2b(content, digest_size=16).digest()
+        if digest in self.exactHashes:
+            self.exactHits += 1
+            return EXACT_DUPLICATE
+        self.exactHashes.add(digest)
+
+        value = content_simhash(content) if self.index is not None else None
+        if value is not None:
+            if self.index.find(value) is not None:
+                self.nearHits += 1
+                return NEAR_DUPLICATE
+            self.index.add(value)
+        return None
+
+    @property
+    def parsesSaved(self):
+        return self.exactHits
+
+    def report(self):
+        return {"checked": self.checked, "exact_duplicates": self.exactHits, "near_duplicates": self.nearHits,
+                "parses_saved": self.parsesSaved, "word_counts_saved": self.exactHits + self.nearHits}
@@ -1,23 +1,26 @@
 import logging
-import re
-from lxml import html
-from urllib.parse import urlparse, urljoin, parse_qs
-from bs4 import BeautifulSoup
 from collections import defaultdict, Counter
-import requests
 from string import punctuation
 
+from parsers import PARSERS
+from url_cache import URLCache
+from url_filter import ALLOWED_SCHEMES, ExtensionRule
+
 logger = logging.getLogger(__name__)
 
+
 class Crawler:
     """
     This class is responsible for scraping urls from the next available link in frontier and adding the scraped links to
     the frontier
     """
 
-    def __init__(self, frontier, corpus):
+    def __init__(self, frontier, corpus, parser="bs4"):
         self.frontier = frontier
         self.corpus = corpus
+        self.parser = PARSERS[parser]  # see parsers.PARSERS
+        self.urlCache = URLCache()
+        self.extensionRule = ExtensionRule()
         self.domainCount = defaultdict(int)
         
         # analytics 1: subdomains
@@ -99,7 +102,7 @@ class Crawler:
             for next_link in self.extract_next_links(url_data):
                 if self.is_valid(next_link):
                     # ------ ANALYTICS 1 ------
-                    parsed = urlparse(url)
+                    parsed = self.urlCache.parse(url)
                     subdomain = parsed.netloc.split('.')[0]
                     self.subdomainCount[subdomain] += 1
                     # ------ ANALYTICS 1 ------
@@ -135,9 +138,7 @@ class Crawler:
         """
         outputLinks = []
 
-        content = BeautifulSoup(url_data["content"], "lxml")
-        for a in content.find_all('a', href=True):
-            outputLinks.append(urljoin(url_data["url"], a['href']))
+        outputLinks.extend(self.parser.links(url_data["content"], url_data["url"]))
 
         return outputLinks
 
@@ -148,9 +149,9 @@ class Crawler:
         in this method
         """
 
-        parsed = urlparse(url)
+        parsed = self.urlCache.parse(url)
 
-        if parsed.scheme not in set(["http", "https"]):
+        if parsed.scheme not in ALLOWED_SCHEMES:
             return False
         try:
             # Very long URL
@@ -166,7 +167,7 @@ class Crawler:
             # Many query params or very long query
             query = parsed.query
             if len(query) > 0:
-                query_count = parse_qs(query)
+                query_count = parsed.queryParams
                 if(len(query_count.values()) > 3):
                     return False
 
@@ -189,11 +190,7 @@ class Crawler:
                     visited_paths.add(p)
 
             return ".ics.uci.edu" in parsed.hostname \
-                   and not re.match(".*\.(css|js|bmp|gif|jpe?g|ico" + "|png|tiff?|mid|mp2|mp3|mp4" \
-                                    + "|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf" \
-                                    + "|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso|epub|dll|cnf|tgz|sha1" \
-                                    + "|thmx|mso|arff|rtf|jar|csv" \
-                                    + "|rm|smil|wmv|swf|wma|zip|rar|gz|pdf)$", parsed.path.lower())
+                   and self.extensionRule(url, parsed)
 
         except TypeError:
             print("TypeError for ", parsed)
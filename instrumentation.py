@@ -0,0 +1,149 @@
+import io
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """
+    Reusable context manager adding wall time to one stage. Stages of the same name do not nest, so one timer per
+    stage is enough and nothing is allocated per use.
+    """
+    __slots__ = ("count", "seconds", "start")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds += time.perf_counter() - self.start
+        self.count += 1
+        return False
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullStats:
+    """
+    Stand-in used when instrumentation is off, so the crawl loop does not need to check for it.
+    """
+    timer = NullTimer()
+
+    def stage(self, name):
+        return self.timer
+
+    def begin_page(self):
+        pass
+
+    def end_page(self, links):
+        pass
+
+    def record_parse(self, size, seconds):
+        pass
+
+    def summary(self):
+        return {}
+
+
+class CrawlStats:
+    """
+    Per-stage timers and counters for the crawl loop, pages/sec and links/sec, and a histogram of parse time by page
+    size (power-of-two byte buckets). Every profile_every pages one page is run under cProfile, and a summary is
+    logged every summary_every seconds. Timing a stage is two perf_counter calls, well under 2% of a page's work.
+    """
+
+    def __init__(self, summary_every=60.0, profile_every=0):
+        self.stages = {}  # {stage name: StageTimer}
+        self.sizeHistogram = {}  # {size bucket: [pages, parse seconds]}
+        self.pages = 0
+        self.links = 0
+        self.started = time.perf_counter()
+        self.summaryEvery = summary_every
+        self.lastSummary = self.started
+        self.profileEvery = profile_every
+        self.profiler = None
+        if profile_every > 0:
+            import cProfile  # with pstats, only imported when profiling is asked for
+            self.profiler = cProfile.Profile()
+        self.profiling = False
+
+    def stage(self, name):
+        timer = self.stages.get(name)
+        if timer is None:
+            timer = self.stages[name] = StageTimer()
+        return timer
+
+    def begin_page(self):
+        if self.profiler is not None and self.pages % self.profileEvery == 0:
+            self.profiling = True
+            self.profiler.enable()
+
+    def end_page(self, links):
+        if self.profiling:
+            self.profiler.disable()
+            self.profiling = False
+
+        self.pages += 1
+        self.links += links
+        now = time.perf_counter()
+        if now - self.lastSummary >= self.summaryEvery:
+            self.lastSummary = now
+            self.log_summary()
+
+    def record_parse(self, size, seconds):
+        bucket = 1 << max(0, int(math.log2(size))) if size > 0 else 0
+        entry = self.sizeHistogram.get(bucket)
+        if entry is None:
+            entry = self.sizeHistogram[bucket] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {"pages": self.pages,
+                "links": self.links,
+                "seconds": elapsed,
+                "pages_per_second": self.pages / elapsed if elapsed > 0 else 0.0,
+                "links_per_second": self.links / elapsed if elapsed > 0 else 0.0,
+                "stages": {name: {"count": timer.count, "seconds": timer.seconds,
+                                  "share": timer.seconds / elapsed if elapsed > 0 else 0.0}
+                           for name, timer in self.stages.items()},
+                "parse_seconds_by_size": {bucket: {"pages": pages, "mean_seconds": seconds / pages}
+                                          for bucket, (pages, seconds) in sorted(self.sizeHistogram.items())}}
+
+    def profile_report(self, lines=15):
+        if self.profiler is None:
+            return ""
+        import pstats
+
+        report = io.StringIO()
+        pstats.Stats(self.profiler, stream=report).sort_stats("cumulative").print_stats(lines)
+        return report.getvalue()
+
+    def log_summary(self):
+        summary = self.summary()
+        logger.info("Crawled %s pages (%.1f pages/s, %.1f links/s)", summary["pages"], summary["pages_per_second"],
+                    summary["links_per_second"])
+        for name, stage in sorted(summary["stages"].items(), key=lambda item: item[1]["seconds"], reverse=True):
+            logger.info("  %-16s %8d calls %9.3fs %5.1f%%", name, stage["count"], stage["seconds"],
+                        100 * stage["share"])
+        for bucket, entry in summary["parse_seconds_by_size"].items():
+            logger.info("  parse of pages >= %8d bytes: %6d pages, %.4fs each", bucket, entry["pages"],
+                        entry["mean_seconds"])
+        if self.profiler is not None:
+            logger.info("Sampled profile:\n%s", self.profile_report())
@@ -0,0 +1,132 @@
+import codecs
+import re
+import time
+from urllib.parse import urljoin
+
+# bump when the links or text extracted from a page change, so cached parse results are thrown away
+EXTRACTOR_VERSION = 3
+CHUNK_SIZE = 64 * 1024  # bytes fed to the parser at a time when a page has a parse budget
+
+# byte order marks, longest first so utf-32 is not taken for utf-16
+BOMS = [(codecs.BOM_UTF32_LE, "utf-32-le"), (codecs.BOM_UTF32_BE, "utf-32-be"), (codecs.BOM_UTF8, "utf-8"),
+        (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be")]
+# <meta charset=...> or <meta http-equiv=... content="...; charset=...">, looked for near the start of the page
+DECLARED_ENCODING = re.compile(rb"<meta[^>]*?charset\s*=\s*[\"']?\s*([a-zA-Z0-9_.:-]+)", re.IGNORECASE)
+DECLARATION_BYTES = 4096
+
+# text inside these tags is not page text (BeautifulSoup's get_text leaves it out as well)
+SKIP_TEXT_TAGS = frozenset(["script", "style", "template"])
+
+
+class LinkTextTarget:
+    """
+    lxml parser target that collects the absolute href of every <a> tag and the page text in one streaming pass, without
+    building a document tree.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.links = []
+        self.text = []
+        self.skipDepth = 0
+
+    def start(self, tag, attrib):
+        if tag == "a":
+            href = attrib.get("href")
+            if href is not None:
+                self.links.append(urljoin(self.base_url, href))
+        elif tag in SKIP_TEXT_TAGS:
+            self.skipDepth += 1
+
+    def end(self, tag):
+        if tag in SKIP_TEXT_TAGS and self.skipDepth > 0:
+            self.skipDepth -= 1
+
+    def data(self, data):
+        if self.skipDepth == 0:
+            self.text.append(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self.links, "".join(self.text)
+
+
+def decodes_as(content, encoding):
+    # a multi-byte character cut off at the end (by a parse budget) is not an error
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(content, final=False)
+    except (LookupError, UnicodeDecodeError):
+        return False
+    return True
+
+
+def detect_encoding(content):
+    """
+    The encoding of a page's bytes, picked in the order BeautifulSoup's UnicodeDammit tries them: a byte order mark,
+    the encoding the page declares, utf-8, windows-1252, and latin-1 when nothing else fits. Left to itself lxml
+    reads a page without a declaration as latin-1, which garbles utf-8 urls. Returns Python's canonical name for the
+    encoding, which lxml also understands. None for content that is already text.
+    """
+    if isinstance(content, str):
+        return None
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding
+    declared = DECLARED_ENCODING.search(content, 0, DECLARATION_BYTES)
+    candidates = ["utf-8", "windows-1252"]
+    if declared is not None:
+        try:
+            # libxml2 does not know many of the names Python accepts (latin_1, koi8_r, ms932), but it knows the
+            # canonical one
+            candidates.insert(0, codecs.lookup(declared.group(1).decode("ascii")).name)
+        except LookupError:
+            pass
+    for encoding in candidates:
+        if decodes_as(content, encoding):
+            return encoding
+    return "latin-1"
+
+
+def extract_page(content, base_url):
+    """
+    Stream the page content through lxml's HTML parser and return its out-links (made absolute against base_url) and
+    its text. Raises etree.LxmlError if lxml cannot make sense of the document.
+    """
+    from lxml import etree  # imported on first use; importing lxml is a good part of the crawler's startup
+
+    parser = etree.HTMLParser(target=LinkTextTarget(base_url), encoding=detect_encoding(content))
+    parser.feed(content)
+    return parser.close()
+
+
+def extract_page_limited(content, base_url, max_bytes=None, max_seconds=None, chunk_size=CHUNK_SIZE):
+    """
+    Like extract_page, but feeds the content to lxml in chunks and stops once max_bytes have been fed or max_seconds
+    have passed. Returns the links and text found up to that point, and "byte budget" / "time budget" when the page
+    was cut short (None when it was parsed whole).
+    """
+    from lxml import etree
+
+    encoding = detect_encoding(content[:max_bytes] if max_bytes is not None else content)
+    parser = etree.HTMLParser(target=LinkTextTarget(base_url), encoding=encoding)
+    started = time.perf_counter()
+    truncated = None
+    for offset in range(0, len(content), chunk_size):
+        if max_bytes is not None and offset >= max_bytes:
+            truncated = "byte budget"
+            break
+        if max_seconds is not None and time.perf_counter() - started > max_seconds:
+            truncated = "time budget"
+            break
+        end = offset + chunk_size
+        if max_bytes is not None and end > max_bytes:
+            end = max_bytes
+        parser.feed(content[offset:end])
+    else:
+        # the last chunk was cut at max_bytes, with no chunk after it left to notice
+        if max_bytes is not None and len(content) > max_bytes:
+            truncated = "byte budget"
+    links, text = parser.close()
+    return links, text, truncated
@@ -0,0 +1,196 @@
+import os
+from array import array
+from functools import lru_cache
+
+from urlstore import URLStore
+
+NPY_HEADER_SIZE = 128  # room for any shape, so the header can be rewritten in place as the column grows
+NPY_TYPES = {'I': '<u4', 'B': '|u1'}  # {array typecode: numpy descr}
+
+# what became of a link, stored per edge
+ADMITTED = 0  # passed is_valid and was in the corpus, so it went to the frontier
+REJECTED = 1  # failed is_valid: a trap or a url not worth crawling
+
+
+@lru_cache(maxsize=None)
+def load_numpy():
+    """
+    numpy, or None when it is not installed. Looked up on the first degree query rather than at import: importing
+    numpy takes longer than starting a short crawl.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class NpyColumn:
+    """
+    Append-only column of uint32 (typecode 'I') or uint8 ('B') written straight to a NumPy .npy file, without needing
+    numpy. The header is padded to a fixed size and rewritten with the final length on every flush, so the file is a
+    valid array at all times.
+    """
+
+    def __init__(self, path, typecode='I'):
+        self.path = path
+        self.descr = NPY_TYPES[typecode]
+        self.length = 0
+        self.file = open(path, 'wb')
+        self.write_header()
+
+    def header(self):
+        text = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}".format(self.descr, self.length)
+        text = text.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"
+        return b"\x93NUMPY\x01\x00" + len(text).to_bytes(2, "little") + text.encode("latin1")
+
+    def write_header(self):
+        self.file.seek(0)
+        self.file.write(self.header())
+        self.file.seek(0, os.SEEK_END)
+
+    def append(self, values):
+        if len(values) > 0:
+            self.file.write(values.tobytes())
+            self.length += len(values)
+
+    def flush(self):
+        self.write_header()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class LinkGraph:
+    """
+    The crawl's link graph as integer ids: every url gets an id from a URLStore (ids follow first appearance), and
+    each source -> target edge is one entry in two parallel uint32 arrays plus a uint8 kind, 9 bytes an edge. Links
+    the crawler admitted are ADMITTED edges and links is_valid turned down are REJECTED ones, for looking into traps;
+    valid links that are not in the corpus are left out. Repeated links on a page are kept as repeated edges, so a
+    page's ADMITTED out-degree is its count for analytic 2.
+
+    With a directory the graph is also streamed there every flush_every edges: sources.npy, targets.npy and kinds.npy
+    (the edge columns, readable with numpy.load) and urls.txt (line n is the url with id n). Degree queries count one
+    kind of edge, ADMITTED unless told otherwise, and use numpy when it is installed and plain arrays otherwise.
+    """
+
+    def __init__(self, directory=None, flush_every=65536):
+        self.urls = URLStore()
+        self.sources = array('I')
+        self.targets = array('I')
+        self.kinds = array('B')
+        self.flushEvery = flush_every
+        self.flushed = 0  # edges already written out
+        self.urlsWritten = 0
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.sourceColumn = NpyColumn(os.path.join(directory, "sources.npy"))
+            self.targetColumn = NpyColumn(os.path.join(directory, "targets.npy"))
+            self.kindColumn = NpyColumn(os.path.join(directory, "kinds.npy"), 'B')
+            self.urlFile = open(os.path.join(directory, "urls.txt"), 'w', encoding="utf-8")
+
+    def add_edges(self, source_url, target_urls, kind=ADMITTED):
+        if len(target_urls) == 0:
+            return
+        add = self.urls.add
+        source = add(source_url)
+        self.sources.extend([source] * len(target_urls))
+        self.targets.extend([add(url) for url in target_urls])
+        self.kinds.extend([kind] * len(target_urls))
+        if self.directory is not None and len(self.sources) - self.flushed >= self.flushEvery:
+            self.flush()
+
+    def flush(self):
+        if self.directory is None:
+            return
+        self.sourceColumn.append(self.sources[self.flushed:])
+        self.targetColumn.append(self.targets[self.flushed:])
+        self.kindColumn.append(self.kinds[self.flushed:])
+        self.flushed = len(self.sources)
+        self.sourceColumn.flush()
+        self.targetColumn.flush()
+        self.kindColumn.flush()
+
+        for entry in range(self.urlsWritten, len(self.urls)):
+            self.urlFile.write(self.urls.get(entry) + "\n")
+        self.urlsWritten = len(self.urls)
+        self.urlFile.flush()
+
+    def close(self):
+        if self.directory is not None and not self.urlFile.closed:
+            self.flush()
+            self.sourceColumn.close()
+            self.targetColumn.close()
+            self.kindColumn.close()
+            self.urlFile.close()
+
+    def degrees(self, column, kind):
+        np = load_numpy()
+        if np is not None:
+            nodes = np.frombuffer(column, dtype=np.uint32)[np.frombuffer(self.kinds, dtype=np.uint8) == kind]
+            return np.bincount(nodes, minlength=len(self.urls))
+        counts = array('I', [0]) * len(self.urls)
+        for node, edge_kind in zip(column, self.kinds):
+            if edge_kind == kind:
+                counts[node] += 1
+        return counts
+
+    def out_degrees(self, kind=ADMITTED):
+        return self.degrees(self.sources, kind)
+
+    def in_degrees(self, kind=ADMITTED):
+        return self.degrees(self.targets, kind)
+
+    def top(self, degrees, k):
+        np = load_numpy()
+        if np is not None:
+            order = np.argsort(-degrees.astype(np.int64), kind="stable")[:k]
+            return [(self.urls.get(int(node)), int(degrees[node])) for node in order if degrees[node] > 0]
+        order = sorted(range(len(degrees)), key=degrees.__getitem__, reverse=True)[:k]
+        return [(self.urls.get(node), degrees[node]) for node in order if degrees[node] > 0]
+
+    def top_out_degree(self, k=10, kind=ADMITTED):
+        """
+        The k pages with the most out-links of a kind, as (url, out-degree), ties by id.
+        """
+        return self.top(self.out_degrees(kind), k)
+
+    def top_in_degree(self, k=10, kind=ADMITTED):
+        """
+        The k urls linked to most often, as (url, in-degree), ties by id. With kind=REJECTED, the urls most often
+        turned down by is_valid.
+        """
+        return self.top(self.in_degrees(kind), k)
+
+    def max_out_links(self):
+        """
+        Analytic 2 over the pages in the graph: the first crawled page with the most admitted out-links, as [url,
+        count]. The crawler keeps analytic 2 itself as it goes; this is the same page for the pages this graph holds.
+        """
+        degrees = self.out_degrees(ADMITTED)
+        if len(degrees) == 0:
+            return ["", 0]
+        np = load_numpy()
+        if np is not None:
+            most = int(degrees.max())
+            if most == 0:
+                return ["", 0]
+            admitted = np.frombuffer(self.kinds, dtype=np.uint8) == ADMITTED
+            first = int(np.argmax(admitted & (degrees[np.frombuffer(self.sources, dtype=np.uint32)] == most)))
+        else:
+            most = max(degrees)
+            if most == 0:
+                return ["", 0]
+            first = next(i for i, (node, kind) in enumerate(zip(self.sources, self.kinds))
+                         if kind == ADMITTED and degrees[node] == most)
+        return [self.urls.get(self.sources[first]), most]
+
+    def memory_bytes(self):
+        return self.urls.memory_bytes() + 4 * (len(self.sources) + len(self.targets)) + len(self.kinds)
+
+    def __len__(self):
+        return len(self.sources)
@@ -0,0 +1,126 @@
+import logging
+import marshal
+import os
+import threading
+import zlib
+from collections import Counter
+from hashlib import blake2b
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+class ParseCache:
+    """
+    Persistent cache of parse results in SQLite, so a crawl re-run over the same corpus does not parse unchanged pages
+    again. Entries are keyed by the page's corpus file name plus a hash of its content and hold its absolute out-links
+    and word counts, as a zlib-compressed marshal dump.
+
+    The cache carries a version string (the tokenizer settings and the extractor version); opening it with a different
+    one empties it. Entries are evicted least recently used first once the stored results pass max_bytes. Writes are
+    committed every commit_every changes and on close. Safe to share between threads.
+    """
+
+    def __init__(self, path, version="", max_bytes=256 * 1024 * 1024, commit_every=200):
+        directory = os.path.dirname(path)
+        if len(directory) > 0:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.maxBytes = max_bytes
+        self.commitEvery = commit_every
+        self.version = "{}:{}".format(FORMAT_VERSION, version)
+        self.lock = threading.Lock()
+        self.uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        import sqlite3  # only crawls that use the cache pay for importing it
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, result BLOB, size INTEGER, "
+                        "used INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_used ON pages (used)")
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != self.version:
+            if row is not None:
+                logger.info("Parse cache %s is version %s, not %s; clearing it", path, row[0], self.version)
+            self.db.execute("DELETE FROM pages")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+            self.db.commit()
+
+        self.size, self.clock = self.db.execute("SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) "
+                                                "FROM pages").fetchone()
+
+    @staticmethod
+    def key(file_name, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return "{}:{}".format(file_name, blake2b(content, digest_size=16).hexdigest())
+
+    def get(self, key):
+        """
+        The cached (links, Counter of words) for a key, or None.
+        """
+        with self.lock:
+            row = self.db.execute("SELECT result FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.clock += 1
+            self.db.execute("UPDATE pages SET used = ? WHERE key = ?", (self.clock, key))
+            self.changed()
+        links, words = marshal.loads(zlib.decompress(row[0]))
+        return links, Counter(words)
+
+    def put(self, key, links, words):
+        result = zlib.compress(marshal.dumps((list(links), dict(Counter(words)))))
+        with self.lock:
+            self.clock += 1
+            old = self.db.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self.size -= old[0]
+            self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)", (key, result, len(result), self.clock))
+            self.size += len(result)
+            if self.size > self.maxBytes:
+                self.evict()
+            self.changed()
+
+    def evict(self):
+        # down to 90% of the cap, so eviction does not run on every put
+        target = self.maxBytes * 0.9
+        while self.size > target:
+            rows = self.db.execute("SELECT key, size FROM pages ORDER BY used LIMIT 256").fetchall()
+            if len(rows) == 0:
+                break
+            for key, size in rows:
+                if self.size <= target:
+                    break
+                self.db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                self.size -= size
+                self.evicted += 1
+
+    def changed(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.commitEvery:
+            self.db.commit()
+            self.uncommitted = 0
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM pages")
+            self.db.commit()
+            self.size = 0
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def report(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+                "bytes": self.size, "evicted": self.evicted}
@@ -0,0 +1,281 @@
+import html
+import re
+import time
+from collections import defaultdict
+from urllib.parse import urljoin
+
+from link_extractor import detect_encoding, extract_page, extract_page_limited
+
+# href of an <a> tag, in double, single or no quotes
+HREF_PATTERN = re.compile(r"""<a\s[^>]*?\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+# markup whose contents are neither links nor page text, and any other tag
+SKIPPED_PATTERN = re.compile(r"<!--.*?-->|<(script|style|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+SNIFF_BYTES = 1024  # how much of a page is looked at to tell markup from plain text
+
+
+class ParseError(Exception):
+    """
+    A backend could not make sense of a document.
+    """
+
+
+class LxmlParser:
+    """
+    lxml's HTML parser driven as a stream, collecting links and text without building a tree. The crawler's default.
+    """
+    name = "lxml"
+
+    def links(self, content, base_url):
+        return self.parse(content, base_url)[0]
+
+    def parse(self, content, base_url, max_bytes=None, max_seconds=None):
+        """
+        The page's absolute out-links, its text and why it was cut short (None when it was parsed whole).
+        """
+        from lxml import etree  # imported on first use, like the other backends
+
+        try:
+            if max_bytes is None and max_seconds is None:
+                return extract_page(content, base_url) + (None,)
+            return extract_page_limited(content, base_url, max_bytes, max_seconds)
+        except (etree.LxmlError, ValueError, LookupError) as e:
+            # LookupError: an encoding libxml2 does not know
+            raise ParseError(str(e)) from e
+
+
+class SoupParser:
+    """
+    BeautifulSoup on lxml, as the original crawler variants parse. The slowest backend, and the most forgiving one,
+    so it is the fallback for documents the others reject and the reference they are measured against. Only the byte
+    budget applies to it.
+    """
+    name = "bs4"
+
+    def soup(self, content):
+        from bs4 import BeautifulSoup
+
+        return BeautifulSoup(content, features="lxml")
+
+    def links(self, content, base_url):
+        return [urljoin(base_url, a['href']) for a in self.soup(content).find_all('a', href=True)]
+
+    def parse(self, content, base_url, max_bytes=None, max_seconds=None):
+        truncated = None
+        if max_bytes is not None and len(content) > max_bytes:
+            content = content[:max_bytes]
+            truncated = "byte budget"
+        soup = self.soup(content)
+        return [urljoin(base_url, a['href']) for a in soup.find_all('a', href=True)], soup.get_text(), truncated
+
+
+class RegexParser:
+    """
+    No parser at all: comments, scripts and styles are cut out of the raw page with regular expressions, hrefs are
+    picked out of what is left and the text is what remains once the tags are gone too. Several times faster than
+    lxml and never fails, but malformed markup can fool it. The encoding is guessed as for lxml (see
+    link_extractor.detect_encoding). Meant for very large pages and plain text. Only the byte budget applies to it.
+    """
+    name = "regex"
+
+    def markup(self, content):
+        """
+        The page as a str, without its comments, scripts and styles.
+        """
+        if isinstance(content, bytes):
+            content = content.decode(detect_encoding(content), "replace")
+        return SKIPPED_PATTERN.sub("", content)
+
+    def links(self, content, base_url):
+        return [urljoin(base_url, html.unescape(double or single or bare))
+                for double, single, bare in HREF_PATTERN.findall(self.markup(content))]
+
+    def parse(self, content, base_url, max_bytes=None, max_seconds=None):
+        truncated = None
+        if max_bytes is not None and len(content) > max_bytes:
+            content = content[:max_bytes]
+            truncated = "byte budget"
+        page = self.markup(content)
+        links = [urljoin(base_url, html.unescape(double or single or bare))
+                 for double, single, bare in HREF_PATTERN.findall(page)]
+        text = html.unescape(TAG_PATTERN.sub("", page))
+        return links, text, truncated
+
+
+PARSERS = {}  # {name: backend}
+
+
+def register_parser(parser):
+    """
+    Make a backend available by its name, to the crawler's parser option and to ParserSelector. A backend has a name
+    and two methods: links(content, base_url), the absolute out-links, and parse(content, base_url, max_bytes,
+    max_seconds), the (links, text, why it was cut short) of a page. It raises ParseError on a document it cannot
+    handle.
+    """
+    PARSERS[parser.name] = parser
+    return parser
+
+
+register_parser(LxmlParser())
+register_parser(SoupParser())
+register_parser(RegexParser())
+
+
+def sniff(url_data, large_bytes):
+    """
+    What kind of document a fetched page is: "plain" when it is not markup (by content type, or no '<' near its
+    start), "large" when it is large_bytes or more, and "html" otherwise.
+    """
+    content = url_data["content"] or b""
+    content_type = (url_data.get("content_type") or "").lower()
+    start = content[:SNIFF_BYTES]
+    if (content_type and "html" not in content_type and "xml" not in content_type) or \
+            ("<" not in start if isinstance(start, str) else b"<" not in start):
+        return "plain"
+    if len(content) >= large_bytes:
+        return "large"
+    return "html"
+
+
+def recall(found, reference):
+    """
+    Share of the distinct items of reference that are also in found; 1.0 when reference is empty.
+    """
+    reference = set(reference)
+    if len(reference) == 0:
+        return 1.0
+    return len(reference.intersection(found)) / len(reference)
+
+
+def precision(found, reference):
+    """
+    Share of the distinct items of found that are also in reference; 1.0 when found is empty.
+    """
+    return recall(reference, found)
+
+
+class ParserSelector:
+    """
+    Picks a parser backend for each document from its kind (see sniff) and from what has been measured so far. Every
+    parse is timed, per kind and backend. The first min_samples documents of a kind, and every sample_every-th one
+    after that, are also parsed with every candidate and with the reference backend, and each candidate's link and word
+    recall and precision against the reference are recorded: a backend is marked down both for what it misses and for
+    what it makes up (links and text out of a <textarea> or an attribute). Samples are parsed on the caller's thread,
+    so they keep to the crawl's parse budgets, and only the first sample_bytes of a page are sampled (a "large" page is
+    otherwise parsed in full three more times).
+
+    Once every candidate has min_samples samples for a kind, that kind goes to the fastest candidate (in bytes per
+    second) whose mean link and word recall and precision are all at least min_recall, and to the default backend
+    (lxml) when none is. Before then the defaults hold: regex for plain text, lxml for the rest.
+    """
+
+    def __init__(self, candidates=("lxml", "regex"), reference="bs4", min_recall=0.98, min_samples=20,
+                 sample_every=100, large_bytes=1 << 20, sample_bytes=256 * 1024, defaults=None):
+        self.candidates = list(candidates)
+        self.reference = reference
+        self.minRecall = min_recall
+        self.minSamples = min_samples
+        self.sampleEvery = sample_every
+        self.largeBytes = large_bytes
+        self.sampleBytes = sample_bytes
+        self.choices = {"plain": "regex", "html": "lxml", "large": "lxml"}  # {kind: backend}
+        self.choices.update(defaults or {})
+        self.documents = defaultdict(int)  # {kind: documents seen}
+        self.timings = {}  # {(kind, backend): [pages, bytes, seconds]}
+        # {(kind, backend): [samples, link recall sum, word recall sum, link precision sum, word precision sum]}
+        self.recalls = {}
+
+    def choose(self, url_data):
+        """
+        The (kind, backend name) to parse a fetched page with.
+        """
+        kind = sniff(url_data, self.largeBytes)
+        return kind, self.choices[kind]
+
+    def record(self, kind, name, size, seconds):
+        timing = self.timings.get((kind, name))
+        if timing is None:
+            timing = self.timings[(kind, name)] = [0, 0, 0.0]
+        timing[0] += 1
+        timing[1] += size
+        timing[2] += seconds
+
+    def observe(self, kind, name, url_data, seconds=None, max_bytes=None, max_seconds=None):
+        """
+        Record how long the chosen backend took on a page (when it was timed here), and sample the page if it is due.
+        max_bytes and max_seconds are the crawl's parse budgets.
+        """
+        size = len(url_data["content"] or b"")
+        if seconds is not None:
+            self.record(kind, name, min(size, max_bytes) if max_bytes is not None else size, seconds)
+        self.documents[kind] += 1
+        seen = self.documents[kind]
+        if seen <= self.minSamples or seen % self.sampleEvery == 0:
+            self.sample(kind, url_data, max_bytes, max_seconds)
+
+    def timed_parse(self, kind, name, content, base_url, max_seconds):
+        started = time.perf_counter()
+        try:
+            links, text, _ = PARSERS[name].parse(content, base_url, None, max_seconds)
+        except (ParseError, LookupError):
+            return None
+        self.record(kind, name, len(content), time.perf_counter() - started)
+        return links, text
+
+    def sample(self, kind, url_data, max_bytes=None, max_seconds=None):
+        """
+        Parse the start of a page with the reference and every candidate, and record how much of the reference's
+        links and words each candidate found, and how much of what it found the reference has.
+        """
+        if url_data["content"] is None:
+            return
+        limit = self.sampleBytes if max_bytes is None else min(max_bytes, self.sampleBytes)
+        content = url_data["content"][:limit]
+        reference = self.timed_parse(kind, self.reference, content, url_data["url"], max_seconds)
+        if reference is None:
+            return
+        reference_words = reference[1].lower().split()
+        for name in self.candidates:
+            result = self.timed_parse(kind, name, content, url_data["url"], max_seconds)
+            stats = self.recalls.get((kind, name))
+            if stats is None:
+                stats = self.recalls[(kind, name)] = [0, 0.0, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            if result is not None:
+                words = result[1].lower().split()
+                stats[1] += recall(result[0], reference[0])
+                stats[2] += recall(words, reference_words)
+                stats[3] += precision(result[0], reference[0])
+                stats[4] += precision(words, reference_words)
+        self.choose_backend(kind)
+
+    def throughput(self, kind, name):
+        pages, size, seconds = self.timings.get((kind, name), (0, 0, 0.0))
+        return size / seconds if seconds > 0 else 0.0
+
+    def choose_backend(self, kind):
+        qualified = []
+        for name in self.candidates:
+            samples, *sums = self.recalls.get((kind, name), (0, 0.0, 0.0, 0.0, 0.0))
+            if samples < self.minSamples:
+                return
+            if all(total / samples >= self.minRecall for total in sums):
+                qualified.append(name)
+        if len(qualified) > 0:
+            self.choices[kind] = max(qualified, key=lambda name: self.throughput(kind, name))
+        else:
+            self.choices[kind] = "lxml"
+
+    def report(self):
+        backends = {}
+        for (kind, name), (pages, size, seconds) in sorted(self.timings.items()):
+            entry = backends.setdefault(kind, {}).setdefault(name, {})
+            entry.update({"pages": pages, "bytes": size, "seconds": seconds,
+                          "bytes_per_second": size / seconds if seconds > 0 else 0.0})
+        for (kind, name), (samples, *sums) in sorted(self.recalls.items()):
+            entry = backends.setdefault(kind, {}).setdefault(name, {})
+            entry["samples"] = samples
+            for key, total in zip(("link_recall", "word_recall", "link_precision", "word_precision"), sums):
+                entry[key] = total / samples if samples > 0 else None
+        return {"choices": dict(self.choices), "documents": dict(self.documents), "backends": backends}
@@ -0,0 +1,45 @@
+from collections import Counter, OrderedDict
+
+
+class RedirectCache:
+    """
+    Remembers where each redirecting url ends up, and keeps the parse result (out-links and word counts) of recent
+    redirect targets in a bounded LRU, so a target is read and parsed once however many aliases point to it.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.finalURLs = {}  # {source url: final url}
+        self.results = OrderedDict()  # {final url: (links, Counter of words)}
+        self.hits = 0
+        self.misses = 0
+
+    def add_redirect(self, source_url, final_url):
+        self.finalURLs[source_url] = final_url
+
+    def has(self, final_url):
+        """
+        Check for a cached result without touching the LRU order or the stats; safe from worker threads.
+        """
+        return final_url in self.results
+
+    def get(self, final_url):
+        result = self.results.get(final_url)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.results.move_to_end(final_url)
+        return result
+
+    def put(self, final_url, links, words):
+        if final_url in self.results:
+            return
+        self.results[final_url] = (links, words if isinstance(words, Counter) else Counter(words))
+        if len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        return {"redirects": len(self.finalURLs), "cached_targets": len(self.results), "hits": self.hits,
+                "misses": self.misses, "hit_rate": self.hits / lookups if lookups > 0 else 0.0}
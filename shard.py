@@ -0,0 +1,316 @@
+import logging
+import multiprocessing
+import os
+import queue
+import zlib
+from collections import Counter, defaultdict, deque
+from urllib.parse import urlparse
+
+from crawler import Crawler, add_new_urls
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(url, shards):
+    """
+    The shard that owns a url's host. crc32 rather than hash() so every process agrees on it.
+    """
+    host = urlparse(url).netloc.lower()
+    return zlib.crc32(host.encode("utf-8")) % shards
+
+
+class ShardFrontier:
+    """
+    FIFO frontier of one shard, holding urls on hosts this shard owns. Links found here on hosts other shards own are
+    put aside by split_links, unchecked, to be sent to their owner with pop_remote().
+    """
+
+    def __init__(self, shard, shards):
+        self.shard = shard
+        self.shards = shards
+        self.queue = deque()
+        self.urls = set()  # every url ever queued here
+        self.remote = defaultdict(list)  # {shard: [(page url, [links on hosts it owns])]}
+        self.fetched = 0
+
+    def add_url(self, url):
+        if url not in self.urls:
+            self.urls.add(url)
+            self.queue.append(url)
+
+    def add_urls(self, urls):
+        for url in urls:
+            self.add_url(url)
+
+    def split_links(self, url, links):
+        """
+        The links found on page url whose hosts this shard owns. The rest are put aside for their owners, repeats
+        included, since the owner's trap counters count every occurrence.
+        """
+        owned = []
+        remote = defaultdict(list)
+        for link in links:
+            owner = shard_of(link, self.shards)
+            if owner == self.shard:
+                owned.append(link)
+            else:
+                remote[owner].append(link)
+        for owner, owner_links in remote.items():
+            self.remote[owner].append((url, owner_links))
+        return owned
+
+    def pop_remote(self):
+        remote = dict(self.remote)
+        self.remote.clear()
+        return remote
+
+    def has_next_url(self):
+        return len(self.queue) > 0
+
+    def get_next_url(self):
+        self.fetched += 1
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class ShardCrawler(Crawler):
+    """
+    Crawler of one shard. is_valid only sees links on hosts this shard owns, so each host's trap counters live in
+    one process: links a page has to other shards' hosts go to their owner as found and are checked there
+    (check_remote). Repeating subdirectories are counted per host for the same reason. A page's admitted out-links
+    can therefore be counted on several shards; outLinks keeps this shard's share of each page's count, and the
+    coordinator adds them up for analytic 2.
+    """
+
+    def __init__(self, frontier, corpus, **options):
+        super().__init__(frontier, corpus, subdirectories_by_host=True, **options)
+        self.outLinks = Counter()  # {page url: out-links admitted on this shard}
+
+    def process_links(self, url, links):
+        count = super().process_links(url, self.frontier.split_links(url, links))
+        self.outLinks[url] += count
+        return count
+
+    def check_remote(self, url, links):
+        """
+        Check links found on page url of another shard, as if they had been found here.
+        """
+        count = self.check_links(url, links)
+        if count > 0:
+            self.outLinks[url] += count
+
+
+def shard_partials(crawler):
+    """
+    The analytics of one finished shard, as plain data that can be sent back to the coordinator.
+    """
+    if isinstance(crawler.commonWords, Counter):
+        words = dict(crawler.commonWords)
+    else:
+        words = dict(crawler.commonWords.items())
+    return {"pages": crawler.pagesCrawled,
+            "subdomainCount": dict(crawler.subdomainCount),
+            "outLinks": dict(crawler.outLinks),
+            "longestPage": list(crawler.longestPage),
+            "truncatedPages": dict(crawler.truncatedPages),
+            "commonWords": words,
+            "downloadedURLS": list(crawler.downloadedURLS),
+            "traps": list(crawler.traps),
+            "trapCounters": [crawler.domainCount.report(), crawler.subdirectoryCount.report()]}
+
+
+def run_shard(shard, shards, corpus, options, inbox, outbox, exchange_every):
+    """
+    Worker process: crawl the urls this shard owns, sending links for other shards to the coordinator every
+    exchange_every pages, and report idle when the queue runs dry. Stops when the coordinator sends None. A batch from
+    the coordinator is a list of (page url, links) to check here, with no page url for seeds.
+    """
+    frontier = ShardFrontier(shard, shards)
+    crawler = ShardCrawler(frontier, corpus, **options)
+
+    def receive(batch):
+        for url, links in batch:
+            if url is None:
+                frontier.add_urls(links)
+            else:
+                crawler.check_remote(url, links)
+
+    received = 0
+    while True:
+        if not frontier.has_next_url():
+            outbox.put(("idle", shard, received))
+            batch = inbox.get()
+            if batch is None:
+                break
+            received += 1
+            receive(batch)
+            continue
+
+        while True:
+            try:
+                batch = inbox.get_nowait()
+            except queue.Empty:
+                break
+            received += 1
+            receive(batch)
+
+        for _ in range(exchange_every):
+            if not frontier.has_next_url():
+                break
+            crawler.crawl_page(frontier.get_next_url())
+
+        remote = frontier.pop_remote()
+        if len(remote) > 0:
+            outbox.put(("links", shard, remote))
+
+    if crawler.wordCounter is not None:
+        crawler.wordCounter.close()  # lazy_words: count the pages still queued before the analytics are collected
+    if crawler.analyticsDir is not None:
+        crawler.downloadedURLS.flush()
+        crawler.traps.flush()
+    partials = shard_partials(crawler)
+    partials["fetched"] = frontier.fetched
+    if crawler.analyticsDir is not None:
+        crawler.downloadedURLS.close()
+        crawler.traps.close()
+    if crawler.parseCache is not None:
+        crawler.parseCache.close()
+    if crawler.linkGraph is not None:
+        crawler.linkGraph.close()
+    outbox.put(("result", shard, partials))
+
+
+class ShardedCrawl:
+    """
+    Splits a crawl over `shards` worker processes, each owning the hosts that hash to it. Every shard runs its own
+    Crawler with its own frontier, trap counters (domainCount, subdirectoryCount) and analytics; links to a host owned
+    by another shard are the only thing exchanged, and they go through the coordinator.
+
+    Links are checked by is_valid on the shard that owns their host, wherever they were found, so all of a host's trap
+    state lives in one process. A single-process crawl counts repeating subdirectories by path across all hosts, which
+    no shard could own, so shards count them per host (subdirectories_by_host) and the trap decisions differ from a
+    plain Crawler's there; they do not depend on the number of shards. Links from other shards arrive in batches,
+    every exchange_every pages, so a host's counters see them in a different order than with fewer shards, which can
+    still move a trap threshold by a few links. Shards crawl serially; crawler options such as the trap counter,
+    dedup or batch admission are passed to every shard, analytics_dir / checkpoint_dir / graph_dir get a
+    subdirectory per shard and parse_cache a file per shard.
+
+    The crawl is over when every shard is idle and has received every batch of links sent to it. The partial
+    analytics are then merged: downloaded and trap urls are unioned (subdomainCount counts the union rather than
+    summing the shards' counts), commonWords are summed, longestPage takes the largest and maxOutLinks the page with the
+    most out-links summed over the shards that admitted them.
+    """
+
+    def __init__(self, corpus, seeds, shards=None, exchange_every=50, **options):
+        self.corpus = corpus
+        self.seeds = list(seeds)
+        self.shards = shards or os.cpu_count() or 1
+        self.exchangeEvery = exchange_every
+        self.options = options
+        self.exchanged = 0  # links sent between shards
+        self.shardReports = {}
+
+    def shard_options(self, shard):
+        options = dict(self.options)
+        for key in ("analytics_dir", "checkpoint_dir", "graph_dir"):
+            if options.get(key) is not None:
+                options[key] = os.path.join(options[key], "shard{}".format(shard))
+                os.makedirs(options[key], exist_ok=True)
+        if options.get("parse_cache") is not None:
+            # one SQLite file per shard: a shard holds its write transaction open between commits
+            root, extension = os.path.splitext(options["parse_cache"])
+            options["parse_cache"] = "{}.shard{}{}".format(root, shard, extension)
+        return options
+
+    def start_crawling(self):
+        """
+        Run the shards to completion and return a Crawler holding the merged analytics (also written to
+        analytics.txt, in analytics_dir when one is set).
+        """
+        outbox = multiprocessing.Queue()
+        inboxes = [multiprocessing.Queue() for _ in range(self.shards)]
+        workers = [multiprocessing.Process(target=run_shard, name="shard{}".format(shard),
+                                           args=(shard, self.shards, self.corpus, self.shard_options(shard),
+                                                 inboxes[shard], outbox, self.exchangeEvery))
+                   for shard in range(self.shards)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            sent = [0] * self.shards
+            idle = {}  # {shard: batches received when it last reported idle}
+            seeds = defaultdict(list)
+            for url in self.seeds:
+                seeds[shard_of(url, self.shards)].append(url)
+            for shard, urls in seeds.items():
+                inboxes[shard].put([(None, urls)])
+                sent[shard] += 1
+
+            results = {}
+            finished = False
+            while len(results) < self.shards:
+                try:
+                    kind, shard, data = outbox.get(timeout=1.0)
+                except queue.Empty:
+                    for worker in workers:
+                        if worker.exitcode not in (None, 0):
+                            raise RuntimeError("{} exited with code {}".format(worker.name, worker.exitcode))
+                    continue
+
+                if kind == "links":
+                    idle.pop(shard, None)
+                    for target, batch in data.items():
+                        inboxes[target].put(batch)
+                        sent[target] += 1
+                        self.exchanged += sum(len(links) for _, links in batch)
+                elif kind == "idle":
+                    idle[shard] = data
+                    if not finished and len(idle) == self.shards and \
+                            all(idle[s] == sent[s] for s in range(self.shards)):
+                        finished = True
+                        for inbox in inboxes:
+                            inbox.put(None)
+                else:
+                    results[shard] = data
+
+            for worker in workers:
+                worker.join()
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+        return self.merge(results)
+
+    def merge(self, results):
+        merged = Crawler(None, self.corpus, analytics_dir=self.options.get("analytics_dir"),
+                         top_words=self.options.get("top_words", 50),
+                         parse_max_bytes=self.options.get("parse_max_bytes"),
+                         parse_max_seconds=self.options.get("parse_max_seconds"))
+        outLinks = Counter()
+        for shard in sorted(results):
+            partials = results[shard]
+            outLinks.update(partials["outLinks"])
+            merged.count_subdomains(add_new_urls(partials["downloadedURLS"], merged.downloadedURLS))
+            merged.traps.update(partials["traps"])
+            merged.commonWords.update(partials["commonWords"])
+            merged.truncatedPages.update(partials["truncatedPages"])
+            if partials["longestPage"][1] > merged.longestPage[1]:
+                merged.longestPage = partials["longestPage"]
+            merged.pagesCrawled += partials["pages"]
+            self.shardReports[shard] = {"pages": partials["pages"], "fetched": partials["fetched"],
+                                        "subdomains": partials["subdomainCount"],
+                                        "trap_counters": partials["trapCounters"]}
+        for url, count in outLinks.items():
+            if count > merged.maxOutLinks[1]:
+                merged.maxOutLinks = [url, count]
+
+        merged.analytics()
+        if merged.analyticsDir is not None:
+            merged.downloadedURLS.close()
+            merged.traps.close()
+        logger.info("Sharded crawl of %s pages over %s shards, %s links exchanged", merged.pagesCrawled, self.shards,
+                    self.exchanged)
+        return merged
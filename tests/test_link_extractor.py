@@ -0,0 +1,54 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_extractor import CHUNK_SIZE, extract_page_limited  # noqa: E402
+
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    lxml = None
+
+BASE_URL = "http://www.ics.uci.edu/"
+
+
+def link_page(links):
+    return b"<html><body>" + b"".join(b'<a href="/p%d.html">x</a>' % i for i in range(links)) + b"</body></html>"
+
+
+@unittest.skipIf(lxml is None, "lxml is not installed")
+class ExtractPageLimitedTest(unittest.TestCase):
+
+    def test_page_within_budget_is_whole(self):
+        content = link_page(100)
+        links, text, truncated = extract_page_limited(content, BASE_URL, max_bytes=len(content))
+        self.assertEqual(len(links), 100)
+        self.assertIsNone(truncated)
+
+    def test_budget_inside_the_last_chunk(self):
+        # the page ends before the chunk after max_bytes would start, so the loop runs out rather than breaking
+        content = link_page(4500)
+        max_bytes = CHUNK_SIZE + CHUNK_SIZE // 2
+        self.assertLess(max_bytes, len(content))
+        self.assertLess(len(content), 2 * CHUNK_SIZE)
+        links, text, truncated = extract_page_limited(content, BASE_URL, max_bytes=max_bytes)
+        self.assertLess(len(links), 4500)
+        self.assertEqual(truncated, "byte budget")
+
+    def test_budget_on_a_chunk_boundary(self):
+        content = link_page(4500)
+        self.assertGreater(len(content), CHUNK_SIZE)
+        links, text, truncated = extract_page_limited(content, BASE_URL, max_bytes=CHUNK_SIZE)
+        self.assertLess(len(links), 4500)
+        self.assertEqual(truncated, "byte budget")
+
+    def test_budget_in_the_first_chunk(self):
+        content = link_page(1000)
+        links, text, truncated = extract_page_limited(content, BASE_URL, max_bytes=len(content) - 1)
+        self.assertEqual(truncated, "byte budget")
+
+
+if __name__ == "__main__":
+    unittest.main()
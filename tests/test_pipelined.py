@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import SyntheticCorpus, SyntheticFrontier  # noqa: E402
+from crawler import Crawler  # noqa: E402
+
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    lxml = None
+
+
+class RecordingFrontier(SyntheticFrontier):
+    """
+    SyntheticFrontier that remembers the order urls were taken off it.
+    """
+
+    def __init__(self, seeds=()):
+        super().__init__(seeds)
+        self.order = []
+
+    def get_next_url(self):
+        url = super().get_next_url()
+        self.order.append(url)
+        return url
+
+
+class PipelinedCrawlTest(unittest.TestCase):
+
+    def setUp(self):
+        # the analytics report is written to the working directory
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        self.corpus = SyntheticCorpus(300, 20, seed=5)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def crawl(self, **options):
+        frontier = RecordingFrontier(self.corpus.seeds())
+        crawler = Crawler(frontier, self.corpus, **options)
+        crawler.start_crawling()
+        return {"order": frontier.order,
+                "downloaded": sorted(crawler.downloadedURLS),
+                "traps": sorted(crawler.traps),
+                "subdomains": dict(crawler.subdomainCount),
+                "words": dict(crawler.commonWords),
+                "longest": list(crawler.longestPage),
+                "most_links": list(crawler.maxOutLinks),
+                "pages": crawler.pagesCrawled}
+
+    def check_modes(self, parser):
+        serial = self.crawl(parser=parser)
+        self.assertGreater(serial["pages"], 50)
+        for options in ({"fetch_workers": 3}, {"fetch_workers": 2, "pages_in_flight": 16},
+                        {"fetch_workers": 2, "parse_workers": 2}):
+            with self.subTest(parser=parser, **options):
+                self.assertEqual(self.crawl(parser=parser, **options), serial)
+
+    def test_same_urls_as_serial(self):
+        self.check_modes("regex")
+
+    @unittest.skipIf(lxml is None, "lxml is not installed")
+    def test_same_urls_as_serial_lxml(self):
+        self.check_modes("lxml")
+
+
+if __name__ == "__main__":
+    unittest.main()
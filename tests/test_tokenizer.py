@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokenizer import DEFAULT_TOKENIZER, STOP_WORDS, Tokenizer, reference_tokens  # noqa: E402
+
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+
+class TextExtractor(HTMLParser):
+    """
+    Collects a page's text the way the crawler sees it: without markup, scripts or styles, and with entities decoded.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.skipDepth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self.skipDepth += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self.skipDepth > 0:
+            self.skipDepth -= 1
+
+    def handle_data(self, data):
+        if self.skipDepth == 0:
+            self.text.append(data)
+
+
+def page_texts():
+    """
+    (name, text) for every sample page, both as raw markup and as extracted text.
+    """
+    for name in sorted(os.listdir(PAGES)):
+        with open(os.path.join(PAGES, name), encoding="utf-8") as page:
+            raw = page.read()
+        yield name, raw
+        extractor = TextExtractor()
+        extractor.feed(raw)
+        extractor.close()
+        yield name + " (text)", "".join(extractor.text)
+
+
+class TokenizerEquivalenceTest(unittest.TestCase):
+
+    def test_sample_pages_match_reference(self):
+        for name, text in page_texts():
+            with self.subTest(page=name):
+                tokens = DEFAULT_TOKENIZER.tokens(text)
+                self.assertGreater(len(tokens), 0)
+                self.assertEqual(tokens, reference_tokens(text))
+
+    def test_sample_page_ending_in_a_token(self):
+        # notes.txt has no trailing newline, so its last word is never closed by a separator
+        with open(os.path.join(PAGES, "notes.txt"), encoding="utf-8") as page:
+            text = page.read()
+        self.assertTrue(text.endswith("assignment"))
+        self.assertNotIn("assignment", DEFAULT_TOKENIZER.tokens(text))
+        self.assertEqual(DEFAULT_TOKENIZER.tokens(text + "\n")[-1], "assignment")
+        self.assertEqual(DEFAULT_TOKENIZER.tokens(text + "\n"), reference_tokens(text + "\n"))
+
+    def test_trailing_token_is_dropped(self):
+        cases = ["crawler frontier", "crawler frontier.", "crawler frontier\n", "crawler 2018", "crawler x",
+                 "crawler café", "crawler café", "frontier", "", ".", "Ünïcode ends here"]
+        for text in cases:
+            with self.subTest(text=text):
+                self.assertEqual(DEFAULT_TOKENIZER.tokens(text), reference_tokens(text))
+        self.assertEqual(DEFAULT_TOKENIZER.tokens("crawler frontier"), ["crawler"])
+        self.assertEqual(DEFAULT_TOKENIZER.tokens("crawler frontier."), ["crawler", "frontier"])
+
+    def test_filters_match_reference(self):
+        text = "The ICS2 building: don't wait for A1 or 2018 at 10am; x y zz IS Is is. "
+        self.assertEqual(DEFAULT_TOKENIZER.tokens(text), reference_tokens(text))
+        self.assertEqual(Tokenizer(STOP_WORDS - {"is"}).tokens(text), reference_tokens(text, STOP_WORDS - {"is"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import random
+import sys
+import unittest
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from counters import CountMinSketch, ExactCounter  # noqa: E402
+from url_filter import UrlFilter, reference_is_valid  # noqa: E402
+
+HOSTS = ["www.ics.uci.edu", "vision.ics.uci.edu", "WWW.ICS.UCI.EDU", "ics.uci.edu", "www.ics.uci.edu:8080",
+         "www.cs.uci.edu", "example.com", "user@www.ics.uci.edu", ""] + ["h{}.ics.uci.edu".format(i) for i in range(30)]
+SCHEMES = ["http", "https", "HTTP", "ftp", "mailto", ""]
+SEGMENTS = ["", "a", "b", "people", "calendar", "2017-03", "index.html", "dir.v2", "x" * 30] + \
+    ["s{}".format(i) for i in range(40)]
+EXTENSIONS = ["", ".html", ".php", ".pdf", ".PDF", ".jpg", ".jpeg", ".tiff", ".tar.gz", ".txt", ".mp4x", ".css/"]
+QUERIES = ["", "?", "?a=1", "?a=1&b=2&c=3", "?a=1&b=2&c=3&d=4", "?a=1&a=2&a=3&a=4", "?a=&b=", "?q=" + "v" * 25,
+           "?q=" + "v" * 26, "?q=%41" * 2, "?a=1;b=2", "?&&&&", "#frag"]
+
+
+def generated_urls(count, seed):
+    """
+    Urls built from a small pool of parts, so the same hosts, paths and subdirectories come up again and again and
+    the trap counters fill up.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(count // 4):
+        path = "/".join(rng.choice(SEGMENTS) for _ in range(rng.randint(0, 6)))
+        url = "{}://{}/{}{}{}".format(rng.choice(SCHEMES), rng.choice(HOSTS), path, rng.choice(EXTENSIONS),
+                                      rng.choice(QUERIES))
+        pool.append(url)
+    pool.extend(["http://[::1/", "http://www.ics.uci.edu/" + "y" * 80, "//www.ics.uci.edu/a", "www.ics.uci.edu/a",
+                 "https://www.ics.uci.edu", "http:///a.html"])
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def reference_decisions(urls):
+    domain_count = defaultdict(int)
+    subdirectory_count = defaultdict(int)
+    decisions = []
+    for url in urls:
+        try:
+            decisions.append(reference_is_valid(url, domain_count, subdirectory_count))
+        except ValueError:
+            decisions.append(None)
+    return decisions
+
+
+def mismatches(urls, decisions, expected):
+    return [(url, got, want) for url, got, want in zip(urls, decisions, expected) if got != want][:10]
+
+
+def filter_decisions(url_filter, urls):
+    decisions = []
+    for url in urls:
+        try:
+            decisions.append(url_filter.is_valid(url))
+        except ValueError:
+            decisions.append(None)
+    return decisions
+
+
+class UrlFilterEquivalenceTest(unittest.TestCase):
+
+    def test_same_decisions_as_reference(self):
+        for seed in range(3):
+            urls = generated_urls(20000, seed)
+            with self.subTest(seed=seed):
+                expected = reference_decisions(urls)
+                decisions = filter_decisions(UrlFilter.default(ExactCounter(), ExactCounter()), urls)
+                self.assertEqual(mismatches(urls, decisions, expected), [])
+                self.assertGreater(expected.count(True), 1000)
+                self.assertGreater(expected.count(False), 1000)
+
+    def test_batch_matches_reference(self):
+        urls = [url for url in generated_urls(20000, 7) if not url.startswith("http://[")]
+        expected = reference_decisions(urls)
+        valid, traps = UrlFilter.default(ExactCounter(), ExactCounter()).filter_links(urls)
+        self.assertTrue(valid == [url for url, accepted in zip(urls, expected) if accepted])
+        self.assertTrue(traps == [url for url, accepted in zip(urls, expected) if not accepted])
+
+    def test_wide_count_min_matches_reference(self):
+        # wide enough that no two keys of this stream collide
+        urls = generated_urls(5000, 11)
+        url_filter = UrlFilter.default(CountMinSketch(1 << 20, 4), CountMinSketch(1 << 20, 4))
+        self.assertEqual(mismatches(urls, filter_decisions(url_filter, urls), reference_decisions(urls)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
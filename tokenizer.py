@@ -0,0 +1,105 @@
+import re
+import sys
+from hashlib import blake2b
+
+STOP_WORDS = frozenset(['i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've", "you'll", "you'd",
+                        'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', "she's",
+                        'her', 'hers', 'herself', 'it', "it's", 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves',
+                        'what', 'which', 'who', 'whom', 'this', 'that', "that'll", 'these', 'those', 'am', 'is', 'are', 'was',
+                        'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing', 'a', 'an',
+                        'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for', 'with',
+                        'about',
+                        'against', 'between', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from',
+                        'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here',
+                        'there',
+                        'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some',
+                        'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will',
+                        'just',
+                        'don', "don't", 'should', "should've", 'now', 'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren',
+                        "aren't", 'couldn', "couldn't", 'didn', "didn't", 'doesn', "doesn't", 'hadn', "hadn't", 'hasn', "hasn't",
+                        'haven',
+                        "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn', "mustn't", 'needn', "needn't", 'shan',
+                        "shan't", 'shouldn', "shouldn't", 'wasn', "wasn't", 'weren', "weren't", 'won', "won't", 'wouldn',
+                        "wouldn't"])
+
+# a token is a run of ascii letters and digits; everything else separates tokens
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+
+class Tokenizer:
+    """
+    Splits page text into lowercase token words, leaving out stopwords, numbers and tokens shorter than min_length. The
+    same instance can be shared by any analytic that counts words.
+    """
+
+    def __init__(self, stop_words=STOP_WORDS, min_length=2):
+        self.stopWords = frozenset(stop_words)
+        self.minLength = min_length
+
+    def fingerprint(self):
+        """
+        Short digest of everything that decides this tokenizer's output, for caches of its results.
+        """
+        settings = repr((TOKEN_PATTERN.pattern, sorted(self.stopWords), self.minLength)).encode("utf-8")
+        return blake2b(settings, digest_size=8).hexdigest()
+
+    def tokens(self, text):
+        """
+        Return the token words of text, in order.
+        """
+        matches = TOKEN_PATTERN.findall(text)
+
+        # a token only ends at a separator, so a token running up to the very end of the text is not counted
+        if len(matches) > 0 and text[-1].isascii() and text[-1].isalnum():
+            matches.pop()
+
+        # tokens are pure ascii, so they can be lowercased in one go
+        words = " ".join(matches).lower().split()
+
+        stopWords = self.stopWords
+        minLength = self.minLength
+        return [w for w in words if len(w) >= minLength and not w.isdigit() and w not in stopWords]
+
+    def count(self, text, counter):
+        """
+        Add the token words of text to counter (a Counter) and return how many there were.
+        """
+        words = self.tokens(text)
+        counter.update(words)
+        return len(words)
+
+
+DEFAULT_TOKENIZER = Tokenizer()
+
+
+def reference_tokens(text, stop_words=STOP_WORDS):
+    """
+    The original character-by-character tokenizer, kept to check Tokenizer against.
+    """
+    words = []
+
+    temp = ""
+    for c in text:
+        if c.isalnum() and c.isascii():
+            temp += c
+        else:
+            if len(temp) > 1 and temp.isdigit() == False:
+                temp = temp.lower()
+                if temp not in stop_words:
+                    words.append(temp)
+            temp = ""
+
+    return words
+
+
+if __name__ == "__main__":
+    # equivalence check on real pages: python tokenizer.py page.html [page.html ...]
+    mismatches = 0
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8", errors="replace") as page:
+            text = page.read()
+        if DEFAULT_TOKENIZER.tokens(text) != reference_tokens(text):
+            mismatches += 1
+            print("MISMATCH", path)
+    print("{} pages checked, {} mismatches".format(len(sys.argv) - 1, mismatches))
+    sys.exit(1 if mismatches > 0 else 0)
@@ -0,0 +1,81 @@
+import heapq
+from collections import Counter
+from operator import itemgetter
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters: tracks at most `capacity` words however many distinct words the crawl sees, and can
+    be asked for the top words at any time. Drop-in for the Counter in Crawler.commonWords (update / most_common /
+    items).
+
+    Guarantees, with N the total number of words counted and m the capacity:
+    - a tracked count never under-estimates, and over-estimates by at most error(word) <= N / m
+    - every word that really occurs more than N / m times is tracked
+    So the top K reported are exact whenever the K-th count is well above N / m; pick m accordingly (a few thousand
+    is plenty for the top 50 of a web crawl).
+    """
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self.counts = {}  # {word: estimated count}
+        self.errors = {}  # {word: over-estimate bound}
+        self.heap = []  # (count, word), may hold stale entries
+        self.total = 0
+
+    def add(self, word, count=1):
+        self.total += count
+        counts = self.counts
+        current = counts.get(word)
+        if current is not None:
+            counts[word] = current + count
+            heapq.heappush(self.heap, (current + count, word))
+        elif len(counts) < self.capacity:
+            counts[word] = count
+            self.errors[word] = 0
+            heapq.heappush(self.heap, (count, word))
+        else:
+            # replace the word with the smallest count; the newcomer inherits that count as its error
+            while True:
+                smallest, victim = heapq.heappop(self.heap)
+                if counts.get(victim) == smallest:
+                    break
+            del counts[victim]
+            del self.errors[victim]
+            counts[word] = smallest + count
+            self.errors[word] = smallest
+            heapq.heappush(self.heap, (smallest + count, word))
+
+        # every increment leaves a stale heap entry behind, so rebuild the heap once they pile up
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(c, w) for w, c in counts.items()]
+            heapq.heapify(self.heap)
+
+    def update(self, words):
+        """
+        Count an iterable of words, or a {word: count} mapping.
+        """
+        if not hasattr(words, "items"):
+            words = Counter(words)
+        for word, count in words.items():
+            self.add(word, count)
+
+    def most_common(self, n=None):
+        if n is None:
+            return sorted(self.counts.items(), key=itemgetter(1), reverse=True)
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+    def error(self, word):
+        return self.errors.get(word, self.error_bound())
+
+    def error_bound(self):
+        return self.total / self.capacity
+
+    def items(self):
+        return self.counts.items()
+
+    def __getitem__(self, word):
+        return self.counts.get(word, 0)
+
+    def __len__(self):
+        return len(self.counts)
@@ -0,0 +1,100 @@
+import re
+
+from bloom import ScalableBloomFilter
+
+# path segments that vary between pages built from one template
+DATE_SEGMENT = re.compile(r"(19|20)\d\d[-_]?(0?[1-9]|1[0-2])([-_]?[0-3]?\d)?$")
+NUMBER_SEGMENT = re.compile(r"\d+$")
+ID_SEGMENT = re.compile(r"(?=[^/]*\d)[0-9a-fA-F-]{16,}$")
+
+
+def url_template(parsed):
+    """
+    Normalise a parsed url into its template: date, number and id path segments become {date}, {n} and {id}, a run of
+    one repeated segment becomes "segment*", and the query keeps its sorted keys but not their values. Returns the
+    template and whether anything in it was a placeholder.
+    """
+    segments = []
+    previous = None
+    variable = False
+    for segment in parsed.path.split('/'):
+        if segment == previous and len(segment) > 0:
+            if not segments[-1].endswith('*'):
+                segments[-1] += '*'
+            variable = True
+            continue
+        previous = segment
+        if DATE_SEGMENT.match(segment):
+            segment = "{date}"
+        elif NUMBER_SEGMENT.match(segment):
+            segment = "{n}"
+        elif ID_SEGMENT.match(segment):
+            segment = "{id}"
+        else:
+            segments.append(segment)
+            continue
+        segments.append(segment)
+        variable = True
+
+    template = parsed.netloc.lower() + "/".join(segments)
+    if len(parsed.query) > 0:
+        keys = sorted(set(part.split('=', 1)[0] for part in parsed.query.split('&') if len(part) > 0))
+        template += "?" + "&".join(key + "=" for key in keys)
+        variable = True
+    return template, variable
+
+
+class TemplateTrapRule:
+    """
+    Rejects urls whose template grows like a crawler trap. For every template with a placeholder it keeps three
+    counts: distinct urls seen, pages of it crawled, and new urls of it found on its own pages. A calendar or a
+    self-nesting directory keeps linking to fresh instances of itself, so once min_pages of a template have been
+    crawled and they found new instances of it at max_growth or more per page, the template is marked a trap and every
+    later url of it is rejected. Templates without placeholders are never counted.
+
+    Opt in through UrlFilter.default(..., templates=TemplateTrapRule()). The filter tells it which page the links came
+    from with begin_page.
+    """
+    name = "template"
+    needsParse = True
+    stateful = True
+
+    def __init__(self, min_pages=5, max_growth=0.8, capacity=1000000):
+        self.minPages = min_pages
+        self.maxGrowth = max_growth
+        self.seen = ScalableBloomFilter(capacity, 1e-4)  # distinct urls, approximately; grows past capacity
+        self.templates = {}  # {template: [urls, pages crawled, urls found on its own pages]}
+        self.trapTemplates = set()
+        self.sourceTemplate = None
+
+    def begin_page(self, url, parsed):
+        template, variable = url_template(parsed)
+        self.sourceTemplate = template if variable else None
+        if variable:
+            stats = self.templates.get(template)
+            if stats is None:
+                stats = self.templates[template] = [0, 0, 0]
+            stats[1] += 1
+
+    def __call__(self, url, parsed):
+        template, variable = url_template(parsed)
+        if not variable:
+            return True
+        if template in self.trapTemplates:
+            return False
+
+        stats = self.templates.get(template)
+        if stats is None:
+            stats = self.templates[template] = [0, 0, 0]
+        if url not in self.seen:
+            self.seen.add(url)
+            stats[0] += 1
+            if template == self.sourceTemplate:
+                stats[2] += 1
+                if stats[1] >= self.minPages and stats[2] >= self.maxGrowth * stats[1]:
+                    self.trapTemplates.add(template)
+                    return False
+        return True
+
+    def report(self):
+        return {"templates": len(self.templates), "trap_templates": sorted(self.trapTemplates)}
@@ -0,0 +1,67 @@
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+
+
+class ParsedURL:
+    """
+    The parts of a url the crawler looks at, parsed once. Path segments and the query dict are only worked out the
+    first time they are asked for.
+    """
+    __slots__ = ("scheme", "netloc", "hostname", "path", "query", "_segments", "_queryParams")
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.scheme = parsed.scheme
+        self.netloc = parsed.netloc
+        self.hostname = parsed.hostname
+        self.path = parsed.path
+        self.query = parsed.query
+        self._segments = None
+        self._queryParams = None
+
+    @property
+    def segments(self):
+        if self._segments is None:
+            self._segments = tuple(self.path.split('/'))
+        return self._segments
+
+    @property
+    def queryParams(self):
+        """
+        parse_qs of the query. Shared between callers, so treat it as read-only.
+        """
+        if self._queryParams is None:
+            self._queryParams = parse_qs(self.query)
+        return self._queryParams
+
+    def __repr__(self):
+        return "ParsedURL(scheme={!r}, netloc={!r}, path={!r}, query={!r})".format(self.scheme, self.netloc,
+                                                                                 self.path, self.query)
+
+
+class URLCache:
+    """
+    Bounded LRU cache of parsed urls. Navigation links show up on thousands of pages, so most lookups are hits. Memory
+    stays capped at maxsize entries.
+    """
+
+    def __init__(self, maxsize=50000):
+        self.maxsize = maxsize
+        self.parse = lru_cache(maxsize=maxsize)(ParsedURL)
+
+    @property
+    def hits(self):
+        return self.parse.cache_info().hits
+
+    @property
+    def misses(self):
+        return self.parse.cache_info().misses
+
+    def info(self):
+        info = self.parse.cache_info()
+        lookups = info.hits + info.misses
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize,
+                "hit_rate": info.hits / lookups if lookups > 0 else 0.0}
+
+    def clear(self):
+        self.parse.cache_clear()
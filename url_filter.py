@@ -0,0 +1,268 @@
+import re
+from collections import defaultdict
+from urllib.parse import parse_qs, urlparse
+
+from url_cache import URLCache
+
+ALLOWED_SCHEMES = frozenset(["http", "https"])
+
+# file types that are not worth crawling
+IGNORED_EXTENSIONS = frozenset(["css", "js", "bmp", "gif", "jpg", "jpeg", "ico",
+                                "png", "tif", "tiff", "mid", "mp2", "mp3", "mp4",
+                                "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf",
+                                "ps", "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names", "data", "dat",
+                                "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg", "iso", "epub", "dll", "cnf",
+                                "tgz", "sha1",
+                                "thmx", "mso", "arff", "rtf", "jar", "csv",
+                                "rm", "smil", "wmv", "swf", "wma", "zip", "rar", "gz"])
+
+
+class SchemeRule:
+    name = "scheme"
+    needsParse = True
+    stateful = False
+
+    def __call__(self, url, parsed):
+        return parsed.scheme in ALLOWED_SCHEMES
+
+
+class LengthRule:
+    """
+    Very long URL
+    """
+    name = "length"
+    needsParse = False
+    stateful = False
+
+    def __init__(self, max_length=100):
+        self.maxLength = max_length
+
+    def __call__(self, url, parsed):
+        return len(url) <= self.maxLength
+
+
+class RepeatRule:
+    """
+    Visiting pages from same link/domain
+    """
+    name = "repeat"
+    needsParse = True
+    stateful = True
+
+    def __init__(self, counts, max_count=10):
+        self.counts = counts
+        self.maxCount = max_count
+
+    def __call__(self, url, parsed):
+        # keyed by netloc + path, with the netloc as the counter's partition
+        return self.counts.add(parsed.path, parsed.netloc) <= self.maxCount
+
+
+class SubdirectoryRule:
+    """
+    Check continuously repeating subdirectories. The parent path is counted across all hosts, or per host with
+    by_host.
+    """
+    name = "subdirectory"
+    needsParse = True
+    stateful = True
+
+    def __init__(self, counts, max_count=50, by_host=False):
+        self.counts = counts
+        self.maxCount = max_count
+        self.byHost = by_host
+
+    def __call__(self, url, parsed):
+        path = parsed.path
+        last_path_index = path.rfind('/')
+        new_path = path[:last_path_index]
+        if last_path_index == len(path):
+            new_path = new_path[:new_path.rfind('/')]
+        return self.counts.add(new_path, parsed.netloc if self.byHost else "") <= self.maxCount
+
+
+class QueryRule:
+    """
+    Many query params, or a query value that is too long
+    """
+    name = "query"
+    needsParse = True
+    stateful = False
+
+    def __init__(self, max_params=3, max_value_length=25):
+        self.maxParams = max_params
+        self.maxValueLength = max_value_length
+
+    def __call__(self, url, parsed):
+        query = parsed.query
+        # decoding never makes a value longer, so a short query with few separators cannot break either limit
+        if len(query) <= self.maxValueLength and query.count('&') < self.maxParams:
+            return True
+
+        query_count = parsed.queryParams
+        if len(query_count) > self.maxParams:
+            return False
+        for v in query_count.values():
+            if len(v[0]) > self.maxValueLength:
+                return False
+        return True
+
+
+class HostRule:
+    name = "host"
+    needsParse = True
+    stateful = False
+
+    def __init__(self, domain=".ics.uci.edu"):
+        self.domain = domain
+
+    def __call__(self, url, parsed):
+        return self.domain in parsed.hostname
+
+
+class ExtensionRule:
+    name = "extension"
+    needsParse = True
+    stateful = False
+
+    def __init__(self, extensions=IGNORED_EXTENSIONS):
+        self.extensions = frozenset(extensions)
+
+    def __call__(self, url, parsed):
+        parts = parsed.path.lower().rsplit('.', 1)
+        return len(parts) == 1 or parts[1] not in self.extensions
+
+
+class UrlFilter:
+    """
+    Runs a url through an ordered list of rules and accepts it only if every rule passes. Rules are built once, and the
+    cheap stateless checks run first: leading rules that only look at the raw url string run before it is parsed.
+    The trap-counting rules change state, so every rule after them keeps its original place: a url only counts
+    towards a trap if it passed the checks before it, exactly as before.
+    """
+
+    def __init__(self, rules, url_cache=None):
+        self.urlCache = url_cache or URLCache()
+        self.rawRules = []
+        self.parsedRules = []
+
+        # a rule that only needs the raw url can run before parsing, as long as no trap-counting rule came before it
+        stateSeen = False
+        for rule in rules:
+            stateSeen = stateSeen or rule.stateful
+            if not rule.needsParse and not stateSeen:
+                self.rawRules.append(rule)
+            else:
+                self.parsedRules.append(rule)
+        self.rejected = defaultdict(int)  # {rule name: urls rejected}
+
+        # rules that want to know which page the links they check were found on
+        self.pageRules = [rule for rule in rules if hasattr(rule, "begin_page")]
+
+    @classmethod
+    def default(cls, domain_count, subdirectory_count, url_cache=None, templates=None, subdirectories_by_host=False):
+        """
+        The crawler's rules. `templates` is an optional traps.TemplateTrapRule, run after all the others.
+        """
+        rules = [SchemeRule(),
+                 LengthRule(100),
+                 RepeatRule(domain_count, 10),
+                 SubdirectoryRule(subdirectory_count, 50, subdirectories_by_host),
+                 QueryRule(3, 25),
+                 HostRule(".ics.uci.edu"),
+                 ExtensionRule()]
+        if templates is not None:
+            rules.append(templates)
+        return cls(rules, url_cache)
+
+    def is_valid(self, url):
+        for rule in self.rawRules:
+            if not rule(url, None):
+                self.rejected[rule.name] += 1
+                return False
+
+        parsed = self.urlCache.parse(url)
+        try:
+            for rule in self.parsedRules:
+                if not rule(url, parsed):
+                    self.rejected[rule.name] += 1
+                    return False
+            return True
+
+        except TypeError:
+            print("TypeError for ", parsed)
+            return False
+
+    def filter_links(self, links, source_url=None):
+        """
+        Check many links at once, in order, optionally telling the rules the url of the page they were found on.
+        Returns (valid links, trap links).
+        """
+        if source_url is not None and len(self.pageRules) > 0:
+            parsed = self.urlCache.parse(source_url)
+            for rule in self.pageRules:
+                rule.begin_page(source_url, parsed)
+
+        valid = []
+        traps = []
+        is_valid = self.is_valid
+        for link in links:
+            if is_valid(link):
+                valid.append(link)
+            else:
+                traps.append(link)
+        return valid, traps
+
+
+def reference_is_valid(url, domain_count, subdirectory_count):
+    """
+    The original Crawler.is_valid, kept to check UrlFilter.default against. domain_count and subdirectory_count are
+    defaultdict(int)s standing in for the crawler's trap counters.
+    """
+    parsed = urlparse(url)
+
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    try:
+        # Very long URL
+        if len(url) > 100:
+            return False
+
+        # Visiting pages from same link/domain
+        domainName = parsed.netloc + parsed.path
+        domain_count[domainName] += 1
+        if domain_count[domainName] > 10:
+            return False
+
+        # Check continuously repeating subdirectories
+        last_path_index = parsed.path.rfind('/')
+        new_path = parsed.path[:last_path_index]
+        if last_path_index == len(parsed.path):
+            new_index = new_path.rfind('/')
+            new_path = new_path[:new_index]
+        subdirectory_count[new_path] += 1
+        if subdirectory_count[new_path] > 50:
+            return False
+
+        query = parsed.query
+        if len(query) > 0:
+            # Many query params or very long query
+            query_count = parse_qs(query)
+            if (len(query_count.values()) > 3):
+                return False
+
+            # Query value too long
+            for v in query_count.values():
+                if (len(v[0]) > 25):
+                    return False
+
+        return ".ics.uci.edu" in parsed.hostname \
+               and not re.match(".*\\.(css|js|bmp|gif|jpe?g|ico" + "|png|tiff?|mid|mp2|mp3|mp4"
+                                + "|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+                                + "|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso|epub|dll|cnf|tgz|sha1"
+                                + "|thmx|mso|arff|rtf|jar|csv"
+                                + "|rm|smil|wmv|swf|wma|zip|rar|gz|pdf)$", parsed.path.lower())
+
+    except TypeError:
+        print("TypeError for ", parsed)
+        return False
@@ -0,0 +1,118 @@
+from array import array
+
+EMPTY = -1
+
+
+class URLStore:
+    """
+    Compact set of urls that iterates in insertion order. Each url is split into its scheme://host prefix, interned
+    once in a host table, and the rest, appended as utf-8 to one shared bytearray. Per url that leaves an offset, a
+    host id and a hash in flat arrays, plus an open-addressing table of entry numbers for membership, instead of a str
+    object and a set slot.
+
+    Hashes are Python's own, so the table only lives as long as the process; it is rebuilt from the urls whenever the
+    store is loaded again.
+    """
+
+    def __init__(self, urls=()):
+        self.hosts = []  # scheme://host prefixes, by id
+        self.hostIds = {}  # {prefix: id}
+        self.data = bytearray()  # url suffixes, back to back
+        self.offsets = array('Q', [0])  # entry i is data[offsets[i]:offsets[i + 1]]
+        self.entryHosts = array('I')
+        self.hashes = array('q')
+        self.table = array('q', [EMPTY]) * 8  # entry numbers, EMPTY for a free slot
+        self.update(urls)
+
+    @staticmethod
+    def split(url):
+        start = url.find("://")
+        if start < 0:
+            return "", url
+        end = len(url)
+        for separator in "/?#":
+            i = url.find(separator, start + 3)
+            if 0 <= i < end:
+                end = i
+        return url[:end], url[end:]
+
+    def find(self, url, h):
+        """
+        Table slot holding url, or the free slot where it would go.
+        """
+        table = self.table
+        mask = len(table) - 1
+        slot = h & mask
+        while True:
+            entry = table[slot]
+            if entry == EMPTY:
+                return slot
+            if self.hashes[entry] == h and self.get(entry) == url:
+                return slot
+            slot = (slot + 1) & mask
+
+    def get(self, entry):
+        suffix = self.data[self.offsets[entry]:self.offsets[entry + 1]].decode("utf-8", "surrogatepass")
+        return self.hosts[self.entryHosts[entry]] + suffix
+
+    def add(self, url):
+        """
+        Add a url if it is new. Returns its entry number, which is also its position in iteration order.
+        """
+        h = hash(url)
+        slot = self.find(url, h)
+        if self.table[slot] != EMPTY:
+            return self.table[slot]
+
+        prefix, suffix = self.split(url)
+        host = self.hostIds.get(prefix)
+        if host is None:
+            host = self.hostIds[prefix] = len(self.hosts)
+            self.hosts.append(prefix)
+
+        entry = len(self.hashes)
+        self.table[slot] = entry
+        self.hashes.append(h)
+        self.entryHosts.append(host)
+        self.data += suffix.encode("utf-8", "surrogatepass")
+        self.offsets.append(len(self.data))
+
+        if 2 * len(self.hashes) > len(self.table):
+            self.resize(2 * len(self.table))
+        return entry
+
+    def resize(self, size):
+        table = array('q', [EMPTY]) * size
+        mask = size - 1
+        for entry, h in enumerate(self.hashes):
+            slot = h & mask
+            while table[slot] != EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = entry
+        self.table = table
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def index(self, url):
+        """
+        Entry number of a url, or None when it is not in the store.
+        """
+        entry = self.table[self.find(url, hash(url))]
+        return entry if entry != EMPTY else None
+
+    def __contains__(self, url):
+        return self.table[self.find(url, hash(url))] != EMPTY
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __iter__(self):
+        for entry in range(len(self.hashes)):
+            yield self.get(entry)
+
+    def memory_bytes(self):
+        arrays = (self.offsets, self.entryHosts, self.hashes, self.table)
+        return (len(self.data) + sum(a.itemsize * len(a) for a in arrays) +
+                sum(len(host) for host in self.hosts))
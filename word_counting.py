@@ -0,0 +1,113 @@
+import queue
+import threading
+import zlib
+from collections import defaultdict
+from urllib.parse import urlparse
+
+
+class WordPolicy:
+    """
+    Decides which pages get their words counted. A page is skipped when its content type starts with one of
+    skip_content_types or it is larger than max_size bytes; otherwise it is kept with probability sample_rate (or the
+    rate given for its host in host_sample_rates). Sampling is by a crc32 of the url, so a url is always kept or
+    always dropped, whichever process asks.
+    """
+
+    def __init__(self, sample_rate=1.0, host_sample_rates=None, skip_content_types=(), max_size=None):
+        self.sampleRate = sample_rate
+        self.hostSampleRates = host_sample_rates or {}
+        self.skipContentTypes = tuple(skip_content_types)
+        self.maxSize = max_size
+        self.skipped = defaultdict(int)  # {reason: pages}
+
+    def reason_to_skip(self, url_data):
+        """
+        None when the page's words should be counted, otherwise why not.
+        """
+        reason = None
+        content_type = url_data.get("content_type") or ""
+        if self.skipContentTypes and content_type.startswith(self.skipContentTypes):
+            reason = "content type"
+        elif self.maxSize is not None and len(url_data["content"] or b"") > self.maxSize:
+            reason = "size"
+        else:
+            rate = self.sampleRate
+            if self.hostSampleRates:
+                rate = self.hostSampleRates.get(urlparse(url_data["url"]).hostname, rate)
+            if rate < 1.0 and zlib.crc32(url_data["url"].encode("utf-8")) >= rate * 2 ** 32:
+                reason = "sampled out"
+
+        if reason is not None:
+            self.skipped[reason] += 1
+        return reason
+
+
+class WordCounter:
+    """
+    Tokenizes page text and records the words on the crawler, off the crawl loop: jobs go through a bounded queue to
+    one background thread, so link discovery does not wait on text analysis. A single thread takes the jobs in order,
+    so words are recorded in the same order as a serial crawl.
+
+    Call wait() before reading commonWords or longestPage (analytics, checkpoints).
+    """
+
+    def __init__(self, crawler, max_queued=1000):
+        self.crawler = crawler
+        self.jobs = queue.Queue(max_queued)
+        self.counted = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="word-counter", daemon=True)
+        self.thread.start()
+
+    def submit(self, text, url, cached=None, done=None):
+        """
+        Count the words of one page. `cached` is a Counter held by the redirect cache, to be filled with them, and
+        `done` is called with them on the worker thread.
+        """
+        self.jobs.put((text, None, url, cached, done))
+
+    def record(self, words, url):
+        """
+        Record words already counted (a cached redirect target), after any page queued before it.
+        """
+        self.jobs.put((None, words, url, None, None))
+
+    def run(self):
+        tokenizer = self.crawler.tokenizer
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                text, words, url, cached, done = job
+                if text is not None:
+                    with self.crawler.stats.stage("count_words"):
+                        words = tokenizer.tokens(text)
+                    if cached is not None:
+                        cached.update(words)
+                    if done is not None:
+                        done(words)
+                    self.counted += 1
+                if len(words) > 0:
+                    self.crawler.record_words(words, url)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.jobs.task_done()
+
+    def wait(self):
+        """
+        Block until every queued page has been counted.
+        """
+        self.jobs.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def close(self):
+        self.wait()
+        self.jobs.put(None)
+        self.thread.join()
+
+    def report(self):
+        return {"counted": self.counted, "queued": self.jobs.qsize()}